@@ -0,0 +1,310 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Benchmark the database and reporting hot paths on synthetic data.
+
+A deterministic generator fills a SQLite database with the requested number
+of punches across a number of projects.  Each hot path is then timed over
+several range sizes, and the results are written as JSON so that runs can
+be compared, e.g.
+
+    python benchmarks/run.py --records 1000000 --output after.json \\
+        --compare before.json
+"""
+
+from __future__ import absolute_import, division
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.sql import func, select
+
+from chronos import config, db, utils
+from chronos.report import Timesheet
+
+log = logging.getLogger('chronos.benchmarks')
+
+# The ranges timed, as a number of days ending on the last punch.
+RANGES = [
+    ('day', 1),
+    ('week', 7),
+    ('month', 31),
+    ('year', 365),
+    ('all', None),
+]
+
+# Results slower than the baseline by more than this ratio are reported as
+# regressions when comparing.
+REGRESSION_THRESHOLD = 1.10
+
+# The first punch of the generated data, 2015-01-01 00:00:00 UTC.
+BASE_TS = 1420070400
+
+# Ranges with more records than this are not timed with the benchmarks which
+# hold one object per record in memory.
+MATERIALIZE_LIMIT = 1000000
+
+
+def generate(path, records, projects, seed):
+    """Fill a new database with deterministic synthetic punches.
+
+    Punches follow each other with random gaps, each on a random project,
+    and the last punch is left ongoing.
+
+    :param str path: The SQLite database file to create.
+    :param int records: The number of punches.
+    :param int projects: The number of projects.
+    :param int seed: The seed of the random number generator.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    config.config = {'database': {'url': 'sqlite:///%s' % path}}
+    db.connect()
+
+    rng = random.Random(seed)
+    names = [u'project-%04d' % i for i in xrange(projects)]
+
+    with db.conn as tx:
+        tx.executable.execute(tx['project'].table.insert(),
+                              [{'name': name} for name in names])
+    ids = dict((row['name'], row['id']) for row in db.conn['project'].all())
+
+    table = db.conn['record'].table
+    ts = BASE_TS
+    batch = []
+    for i in xrange(records):
+        elapsed = rng.randint(5 * 60, 4 * 60 * 60)
+        if i == records - 1:
+            elapsed = 0
+        batch.append({'project_id': ids[rng.choice(names)],
+                      'start': ts,
+                      'elapsed': elapsed})
+        ts += elapsed + rng.randint(60, 2 * 60 * 60)
+
+        if len(batch) == 10000 or i == records - 1:
+            with db.conn as tx:
+                tx.executable.execute(table.insert(), batch)
+            batch = []
+
+    # The last record is the active session.
+    with db.conn as tx:
+        last_id = tx.executable.execute(
+            select([func.max(table.columns.id)])).scalar()
+        tx['session'].insert({'record_id': last_id})
+
+    db.RecordService().rebuild_rollups()
+
+
+def timed(fn, repeat):
+    """Time the function, returning the statistics in seconds."""
+    samples = []
+    result = None
+    for _ in xrange(repeat):
+        start = time.time()
+        result = fn()
+        samples.append(time.time() - start)
+
+    samples.sort()
+    return {
+        'min': samples[0],
+        'median': samples[len(samples) // 2],
+        'mean': sum(samples) / len(samples),
+        'repeat': repeat,
+    }, result
+
+
+def _cold(fn):
+    """Wrap the function to run without the range cache."""
+
+    def wrapper():
+        db.cache.clear()
+        return fn()
+
+    return wrapper
+
+
+def run(repeat, limit=MATERIALIZE_LIMIT):
+    """Time each hot path over each of the ranges.
+
+    `by_day` and the ledger lines build one object per record, so they are
+    skipped for ranges with more than `limit` records, which are still
+    timed through `iter_records`.
+
+    :param int repeat: The number of times each benchmark is run.
+    :param int limit: The most records materialized in a range.
+    :return list<dict>: One result per benchmark and range.
+    """
+    service = db.RecordService()
+    last = utils.local_time(datetime.utcfromtimestamp(
+        service.ongoing()['start'])).replace(tzinfo=None)
+
+    results = []
+
+    def record(name, range_name, fn):
+        stats, result = timed(fn, repeat)
+        stats.update(name=name, range=range_name)
+        if isinstance(result, (list, dict)):
+            stats['rows'] = len(result)
+        elif isinstance(result, (int, long)):
+            stats['rows'] = result
+        results.append(stats)
+        log.info("%-28s %-6s %10.4f s", name, range_name, stats['median'])
+        return result
+
+    record('ongoing', None, service.ongoing)
+
+    values = range(0, 100000, 7)
+    record('human_time', None,
+           lambda: [utils.human_time(v) for v in values])
+
+    for range_name, days in RANGES:
+        stop = utils.end_of_day(last)
+        start = (utils.start_of_day(last - timedelta(days=days - 1))
+                 if days else utils.start_of_day(
+                     datetime.utcfromtimestamp(BASE_TS)))
+        query = dict(start_date=start, stop_date=stop)
+
+        count = record('iter_records', range_name,
+                       lambda: sum(1 for _ in service.iter_records(**query)))
+        materialize = count <= limit
+        if not materialize:
+            log.info("Skipping by_day and ledger lines over %d records",
+                     count)
+
+        if materialize:
+            record('by_day', range_name,
+                   _cold(lambda: service.by_day(**query)))
+            record('by_day (cached)', range_name,
+                   lambda: service.by_day(**query))
+        record('totals', range_name, lambda: service.totals(**query))
+        record('totals (filtered)', range_name,
+               lambda: service.totals(filter_='PROJECT-001%', **query))
+        record('rollup_totals', range_name,
+               lambda: service.rollup_totals(**query))
+
+        for summary in (True, False):
+            if not summary and not materialize:
+                continue
+            timesheet = Timesheet(start, stop, summary=summary,
+                                  use_rollups=summary and days != 1)
+            name = 'lines (%s)' % ('summary' if summary else 'ledger')
+            record(name, range_name,
+                   _cold(lambda: list(_lines(timesheet))))
+
+    return results
+
+
+def _lines(timesheet):
+    """Load the timesheet and generate its lines, like the `Day` tab."""
+    timesheet.load()
+    return timesheet.lines()
+
+
+def compare(results, baseline):
+    """Print the ratio of each result to the baseline.
+
+    :return int: The number of regressions.
+    """
+    previous = dict(((r['name'], r['range']), r) for r in baseline)
+    regressions = 0
+
+    for result in results:
+        before = previous.get((result['name'], result['range']))
+        if not before or not before['median']:
+            continue
+
+        ratio = result['median'] / before['median']
+        flag = ''
+        if ratio > REGRESSION_THRESHOLD:
+            flag = 'REGRESSION'
+            regressions += 1
+        print("%-28s %-6s %10.4f s %10.4f s %6.2fx %s" % (
+            result['name'], result['range'], before['median'],
+            result['median'], ratio, flag))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records',
+                        help='Number of punches to generate',
+                        type=int,
+                        default=10000)
+    parser.add_argument('--projects',
+                        help='Number of projects to generate',
+                        type=int,
+                        default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat',
+                        help='Number of times each benchmark is run',
+                        type=int,
+                        default=5)
+    parser.add_argument('--db',
+                        help='Database file, defaults to a temporary file')
+    parser.add_argument('--reuse',
+                        help='Reuse the data already in --db',
+                        action='store_true')
+    parser.add_argument('--materialize-limit',
+                        help='Most records in a range timed with by_day and '
+                        'the ledger lines',
+                        type=int,
+                        default=MATERIALIZE_LIMIT)
+    parser.add_argument('--output', help='Write the results to this file')
+    parser.add_argument('--compare',
+                        help='Compare with the results in this file')
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger('alembic').setLevel(logging.WARNING)
+
+    path = options.db or os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    if options.reuse and os.path.exists(path):
+        config.config = {'database': {'url': 'sqlite:///%s' % path}}
+        db.connect()
+    else:
+        start = time.time()
+        generate(path, options.records, options.projects, options.seed)
+        log.info("Generated %d records in %.1f s", options.records,
+                 time.time() - start)
+
+    results = run(options.repeat, options.materialize_limit)
+
+    output = {
+        'meta': {
+            'records': db.conn['record'].count(),
+            'projects': db.conn['project'].count(),
+            'seed': options.seed,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'date': datetime.now().isoformat(),
+        },
+        'results': results,
+    }
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+    else:
+        json.dump(output, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Columnar in-memory store of time records for analytics.
+
+Records are held in parallel arrays of start times, elapsed times and
+project ids, with the project names interned in a separate table.  When
+NumPy is installed the aggregations are vectorized, otherwise they fall
+back to plain Python loops over the same arrays.
+"""
+
+from __future__ import absolute_import, division
+
+import array
+import bisect
+import collections
+import logging
+import time
+from datetime import date
+
+from chronos.db import RecordService
+from chronos.utils import EPOCH_ORDINAL, SECONDS_PER_DAY, LocalTimeConverter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+log = logging.getLogger(__name__)
+
+
+def _typecode(size, *candidates):
+    """Return the first array typecode with the given item size in bytes."""
+    for typecode in candidates:
+        try:
+            if array.array(typecode).itemsize == size:
+                return typecode
+        except ValueError:
+            continue
+    raise ValueError("No array typecode with an item size of %d" % size)
+
+
+INT64 = _typecode(8, 'q', 'l')
+INT32 = _typecode(4, 'i', 'l')
+
+
+class ColumnarStore(object):
+    """Parallel arrays of records, ordered by start time."""
+
+    def __init__(self, names=None):
+        """Create an empty store.
+
+        :param list names: An existing project name table to share.
+        """
+        self.starts = array.array(INT64)
+        self.elapsed = array.array(INT32)
+        self.project_ids = array.array(INT32)
+
+        self.names = names if names is not None else []
+        self._ids = dict((name, i) for i, name in enumerate(self.names))
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a store from an iterable of `Record` tuples.
+
+        The records must be ordered by start time, as they are when
+        streamed by `RecordService.iter_records()`.
+        """
+        store = cls()
+        for record in records:
+            if record.start is not None:
+                store.append(record.project, record.start, record.elapsed)
+        return store
+
+    def __len__(self):
+        return len(self.starts)
+
+    def intern(self, project):
+        """Return the id of the project name, adding it if needed."""
+        try:
+            return self._ids[project]
+        except KeyError:
+            project_id = self._ids[project] = len(self.names)
+            self.names.append(project)
+            return project_id
+
+    def append(self, project, start, elapsed):
+        """Append a record, which must not start before the last one."""
+        self.starts.append(start)
+        self.elapsed.append(elapsed or 0)
+        self.project_ids.append(self.intern(project))
+
+    def slice(self, min_ts=None, max_ts=None):
+        """Return a store of the records started within the range.
+
+        The range is found by binary search on the start times.  The new
+        store shares the project name table with this one.
+
+        :param int min_ts: The minimum start timestamp (inclusive).
+        :param int max_ts: The maximum start timestamp (inclusive).
+        """
+        lo = bisect.bisect_left(self.starts, min_ts) if min_ts else 0
+        hi = (bisect.bisect_right(self.starts, max_ts)
+              if max_ts else len(self.starts))
+
+        store = ColumnarStore(self.names)
+        store._ids = self._ids
+        store.starts = self.starts[lo:hi]
+        store.elapsed = self.elapsed[lo:hi]
+        store.project_ids = self.project_ids[lo:hi]
+        return store
+
+    def _effective_elapsed(self, now):
+        """Return the elapsed times, counting ongoing records until now."""
+        starts = numpy.frombuffer(self.starts, dtype=numpy.int64)
+        elapsed = numpy.frombuffer(self.elapsed, dtype=numpy.int32)
+        return numpy.where(elapsed == 0, now - starts, elapsed)
+
+    def total(self, now=None):
+        """Return the total elapsed seconds of all records."""
+        now = int(time.time()) if now is None else now
+
+        if numpy is not None:
+            return int(self._effective_elapsed(now).sum())
+
+        return sum(e or now - s for s, e in zip(self.starts, self.elapsed))
+
+    def totals(self, now=None):
+        """Return the total elapsed seconds per project name."""
+        now = int(time.time()) if now is None else now
+
+        if numpy is not None:
+            sums = numpy.bincount(
+                numpy.frombuffer(self.project_ids, dtype=numpy.int32),
+                weights=self._effective_elapsed(now),
+                minlength=len(self.names))
+            return dict((self.names[i], int(sums[i]))
+                        for i in numpy.flatnonzero(sums))
+
+        totals = collections.defaultdict(int)
+        for s, e, p in zip(self.starts, self.elapsed, self.project_ids):
+            totals[self.names[p]] += e or now - s
+        return dict(totals)
+
+    def totals_by_day(self, now=None):
+        """Return the total elapsed seconds per local day and project name.
+
+        :return dict: Keyed by (`date`, project name) tuples.
+        """
+        now = int(time.time()) if now is None else now
+        if not len(self):
+            return {}
+
+        converter = LocalTimeConverter(self.starts[0], self.starts[-1])
+
+        if numpy is None:
+            totals = collections.defaultdict(int)
+            for s, e, p in zip(self.starts, self.elapsed, self.project_ids):
+                totals[converter.date(s), self.names[p]] += e or now - s
+            return dict(totals)
+
+        starts = numpy.frombuffer(self.starts, dtype=numpy.int64)
+        idx = numpy.searchsorted(converter.transitions, starts, 'right') - 1
+        offsets = numpy.asarray(converter.offsets, dtype=numpy.int64)[idx]
+        days = (starts + offsets) // SECONDS_PER_DAY
+        first_day = int(days[0])
+
+        # Group on a single key combining the day and the project id.
+        keys = ((days - first_day) * len(self.names) +
+                numpy.frombuffer(self.project_ids, dtype=numpy.int32))
+        sums = numpy.bincount(keys, weights=self._effective_elapsed(now))
+
+        keys = numpy.flatnonzero(sums)
+        days, project_ids = numpy.divmod(keys, len(self.names))
+        dates = [date.fromordinal(first_day + day + EPOCH_ORDINAL)
+                 for day in xrange(int(days[-1]) + 1)] if len(keys) else []
+
+        return dict(((dates[day], self.names[project_id]), elapsed)
+                    for day, project_id, elapsed in zip(
+                        days.tolist(), project_ids.tolist(),
+                        sums[keys].astype(numpy.int64).tolist()))
+
+
+def load(start_date=None, stop_date=None, filter_=None):
+    """Load the records within the range into a `ColumnarStore`.
+
+    :param datetime start_date: An optional starting date (inclusive)
+    :param datetime stop_date: An optional stopping date (inclusive)
+    :param str filter_: filter string for projects.
+    :return ColumnarStore:
+    """
+    records = RecordService().iter_records(start_date=start_date,
+                                           stop_date=stop_date,
+                                           filter_=filter_)
+    store = ColumnarStore.from_records(records)
+    log.debug("Loaded %d records into the columnar store", len(store))
+    return store
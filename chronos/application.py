@@ -8,7 +8,9 @@ import logging
 import Tkinter as tk
 import ttk
 
-from chronos import __NAME__, __VERSION__, event, config
+from chronos import __NAME__, __VERSION__, event, config, instrument, startup
+from chronos import worker
+from chronos.scheduler import Scheduler
 import chronos.ui
 
 log = logging.getLogger(__name__)
@@ -17,12 +19,28 @@ log = logging.getLogger(__name__)
 class Application(object):
     """The application."""
 
-    def __init__(self):
-        """Initialize the main window, and configure the geometry."""
+    def __init__(self, connect=None):
+        """Initialize the main window, and configure the geometry.
+
+        No database queries are made until the window is shown by `run()`.
+
+        :param callable connect: Called to connect to the database once the
+                                 window has been shown.
+        """
         log.debug("Creating the application")
 
+        self.connect = connect
+
         self.window = tk.Tk()
         self.window.title(self.window_title)
+
+        # Coalesce the events published while handling user input into a
+        # single dispatch, once Tk is idle.
+        event.set_scheduler(self.window.after_idle)
+
+        # All periodic refreshes of the widgets are driven by the scheduler.
+        self.scheduler = Scheduler(self.window)
+
         log.info("Available themes %s", ", ".join(ttk.Style().theme_names()))
 
         theme_name = config.ui('theme')
@@ -43,7 +61,7 @@ class Application(object):
         self.configure_grid_layout(self.content, rows=50, cols=24)
 
         self.create_widgets()
-        event.trigger()
+        startup.mark('create window')
 
     def configure_grid_layout(self, parent, rows, cols, rowsize=1, colsize=1):
         """Configure the grid for the given number of rows and columns."""
@@ -71,34 +89,72 @@ class Application(object):
     def configure_left_notebook(self, notebook):
         """Configure the UI tabs on the left notebook."""
 
-        day = chronos.ui.Day(notebook)
+        day = chronos.ui.Day(notebook, self.scheduler)
         notebook.add(day, text='Day', sticky='news')
 
-        week = chronos.ui.Week(notebook)
+        week = chronos.ui.Week(notebook, self.scheduler)
         notebook.add(week, text='Week', sticky='news')
 
-        month = chronos.ui.Month(notebook)
+        month = chronos.ui.Month(notebook, self.scheduler)
         notebook.add(month, text='Month', sticky='news')
 
-        custom = chronos.ui.CustomRange(notebook)
+        custom = chronos.ui.CustomRange(notebook, self.scheduler)
         notebook.add(custom, text='Custom', sticky='news')
 
-        console_log = chronos.ui.Log(notebook)
+        console_log = chronos.ui.Log(notebook, self.scheduler)
         notebook.add(console_log, text="Log", sticky='news')
 
+        if instrument.enabled:
+            diagnostics = chronos.ui.Diagnostics(notebook, self.scheduler)
+            notebook.add(diagnostics, text="Diagnostics", sticky='news')
+
     def configure_right_notebook(self, notebook):
         """Configure the UI tabs on the right notebook."""
 
-        time_clock = chronos.ui.Clock(notebook)
-        notebook.add(time_clock, text="Time")
+        self.time_clock = chronos.ui.Clock(notebook, self.scheduler)
+        notebook.add(self.time_clock, text="Time")
 
-        project = chronos.ui.Project(notebook)
+        project = chronos.ui.Project(notebook, self.scheduler)
         notebook.add(project, text="Project")
 
+    def on_startup(self):
+        """Connect to the database and load the initial state.
+
+        The database is connected and queried on the worker thread, so that
+        the window stays responsive while the initial state is loading.
+        """
+        worker.start(self.window)
+
+        if self.connect is not None:
+            worker.submit(self.connect,
+                          callback=lambda _: startup.mark('connect database'))
+
+        self.time_clock.on_startup()
+        event.trigger()
+        self.scheduler.start()
+        self.window.update()
+
+        # The requests run in order, so this completes after the initial load.
+        worker.submit(lambda: None, callback=self.on_loaded)
+
+    def on_loaded(self, result=None):
+        """Report the startup time once the initial state has been loaded."""
+        startup.mark('initial load')
+        startup.report()
+
     def run(self):
         """Start the TK framework's main loop, and block forever."""
+
+        # Draw the window before anything is loaded from the database.
+        self.window.update()
+        startup.mark('show window')
+
+        self.on_startup()
         self.window.mainloop()
 
+        # Let any pending writes, e.g. stopping the clock, complete.
+        worker.stop()
+
     @property
     def window_title(self):
         """The text to be displayed in the window title."""
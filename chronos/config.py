@@ -9,10 +9,27 @@ import json
 import os
 import yaml
 
+# Use the much faster LibYAML based implementation when available.
+Loader = getattr(yaml, 'CLoader', yaml.Loader)
+Dumper = getattr(yaml, 'CDumper', yaml.Dumper)
+
 log = logging.getLogger(__name__)
 
 config = {}
 
+# Appended to a new config file, documenting the SQLite options.
+DEFAULT_COMMENTS = """
+# On a local drive, reports may be read while the clock is writing by
+# enabling the SQLite write-ahead log.  It relies on shared memory, and is
+# not supported on network drives, where it can corrupt the database.
+#
+# database:
+#   sqlite:
+#     journal_mode: WAL
+#     synchronous: NORMAL
+#     mmap_size: 268435456
+"""
+
 
 def create_default_config(filename):
     """Create a default config file."""
@@ -27,7 +44,9 @@ def create_default_config(filename):
 
     if not os.path.exists(os.path.expanduser(filename)):
         with open(filename, "w") as config_file:
-            yaml.dump(default, config_file, default_flow_style=False)
+            yaml.dump(default, config_file, default_flow_style=False,
+                      Dumper=Dumper)
+            config_file.write(DEFAULT_COMMENTS)
 
 
 def load(filename, dump=None):
@@ -42,7 +61,7 @@ def load(filename, dump=None):
     global config
     try:
         with open(filename, 'r') as config_file:
-            config = yaml.load(config_file)
+            config = yaml.load(config_file, Loader=Loader)
         if dump:
             log.debug(json.dumps(config, indent=2))
 
@@ -4,42 +4,445 @@
 
 from __future__ import absolute_import
 
+import bisect
 import collections
 import dataset
+import itertools
 import logging
+import re
+import time
 from datetime import datetime
 
-from sqlalchemy.sql import and_
+from sqlalchemy import event
+from sqlalchemy.sql import and_, case, false, func, literal, select
 
-from chronos import config
-from chronos.utils import timestamp, local_time, utc_time
+from chronos import config, instrument
+from chronos.utils import (LocalTimeConverter, end_of_day, start_of_day,
+                           timestamp, utc_time)
 
 log = logging.getLogger(__name__)
 
 conn = None
 
+# The number of rows fetched from the cursor at a time when streaming.
+BATCH_SIZE = 1000
+
+# The number of rows inserted per transaction by a bulk import.
+IMPORT_BATCH_SIZE = 10000
+
+# The number of values bound in a single `IN` clause, SQLite allows at most
+# 999 parameters per statement by default.
+MAX_VARIABLES = 500
+
+# Limits on the query results kept by the `RangeCache`.
+CACHE_MAX_ENTRIES = 16
+CACHE_MAX_RECORDS = 100000
+
+# The pragmas set on each SQLite connection, which can be overridden in the
+# `sqlite` section of the database config.  A pragma set to null is left at
+# the SQLite default.
+#
+# The write-ahead log lets reads proceed while a write is in progress, and
+# with it `synchronous = NORMAL` only syncs at checkpoints, but it relies on
+# shared memory and is not supported on network filesystems.  As databases
+# may be kept on shared drives, it is opt-in by setting `journal_mode` to
+# WAL, and the rollback journal is set otherwise, so that a database left
+# in WAL mode by an earlier version is switched back.  Memory mapping is
+# likewise opt-in with `mmap_size`.
+SQLITE_PRAGMAS = collections.OrderedDict([
+    ('busy_timeout', 5000),
+    ('journal_mode', 'DELETE'),
+    ('synchronous', None),
+    ('cache_size', -16000),
+    ('mmap_size', None),
+    ('temp_store', 'MEMORY'),
+])
+
+# SQLite expressions mapping an epoch seconds column to the local date
+# starting the day, week (Monday) or month containing it.
+PERIODS = {
+    'day': lambda c: func.date(c, 'unixepoch', 'localtime'),
+    'week': lambda c: func.date(c, 'unixepoch', 'localtime', 'weekday 0',
+                                '-6 days'),
+    'month': lambda c: func.date(c, 'unixepoch', 'localtime',
+                                 'start of month'),
+}
+
+
+def sqlite_pragmas():
+    """Return the SQLite pragmas, with the config applied to the defaults.
+
+    :return collections.OrderedDict: The pragma values by name.
+    """
+    pragmas = collections.OrderedDict(SQLITE_PRAGMAS)
+    pragmas.update(config.database('sqlite', None) or {})
+    return collections.OrderedDict(
+        (name, value) for name, value in pragmas.iteritems()
+        if value is not None)
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLite tuning profile to a new connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas().iteritems():
+            cursor.execute("PRAGMA %s = %s" % (name, value))
+            log.debug("PRAGMA %s = %s", name, value)
+    finally:
+        cursor.close()
+
 
 def connect():
     """Initialize the connection with the database.
 
     :param dict config: The current configuration.
     """
+    # Alembic is only imported when connecting, on the worker in the GUI.
+    from chronos import migrations
+
     url = config.get('database', {}).get('url', 'sqlite://')
 
     global conn
-    conn = dataset.connect(url)
+    conn = dataset.connect(url, reflect_metadata=False)
+    if conn.engine.dialect.name == 'sqlite':
+        event.listen(conn.engine, 'connect', _set_pragmas)
+
+    # Bring the schema up to date before any tables are loaded, so that
+    # `dataset` sees the migrated tables rather than creating its own.
+    migrations.upgrade(conn.executable)
+    for table_name in conn.engine.table_names():
+        conn.load_table(table_name)
+
+    cache.clear()
+    project_index.invalidate()
+
+
+class Record(collections.namedtuple('Record', 'id project start elapsed')):
+    """A single time record.
+
+    The `start` is in epoch seconds (UTC), and `elapsed` is 0 while the
+    record is ongoing.
+    """
+
+    __slots__ = ()
+
+    @property
+    def stop(self):
+        """The epoch seconds (UTC) when the record was stopped."""
+        return self.start + self.elapsed
+
+
+class RangeCache(object):
+    """Cache of the records fetched for ranges of start times.
+
+    A query is answered from any cached range, fetched with the same
+    project filter, which fully contains it.  Entries are dropped as soon
+    as a record starting within their range is written.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES,
+                 max_records=CACHE_MAX_RECORDS):
+        """Initialize an empty cache.
+
+        :param int max_entries: The number of ranges to keep, the least
+                                recently used are evicted first.
+        :param int max_records: Results larger than this are not cached.
+        """
+        self.max_entries = max_entries
+        self.max_records = max_records
+
+        # A list of (filter_, min_ts, max_ts, starts, records) tuples, with
+        # the most recently used last.  The records are ordered by start.
+        self._entries = []
+
+    @staticmethod
+    def _bounds(min_ts, max_ts):
+        """Map the open ends of a range, given as 0, to infinity."""
+        return (min_ts or float('-inf'), max_ts or float('inf'))
+
+    def get(self, min_ts, max_ts, filter_=None):
+        """Return the cached records within the range, or `None`."""
+        lo, hi = self._bounds(min_ts, max_ts)
+
+        for entry in reversed(self._entries):
+            entry_filter, entry_lo, entry_hi, starts, records = entry
+            if entry_filter == filter_ and entry_lo <= lo and hi <= entry_hi:
+                self._entries.remove(entry)
+                self._entries.append(entry)
+                return records[bisect.bisect_left(starts, lo):
+                               bisect.bisect_right(starts, hi)]
+
+        return None
+
+    def put(self, min_ts, max_ts, filter_, records):
+        """Store the records fetched for the range."""
+        if len(records) > self.max_records:
+            return
+
+        lo, hi = self._bounds(min_ts, max_ts)
+
+        # Any existing range contained in the new one is now redundant.
+        self._entries = [e for e in self._entries
+                         if not (e[0] == filter_ and lo <= e[1] and
+                                 e[2] <= hi)]
+        self._entries.append((filter_, lo, hi, [r.start for r in records],
+                              records))
+        del self._entries[:-self.max_entries]
+
+    def invalidate(self, ts):
+        """Drop the ranges which contain the given start time."""
+        self._entries = [e for e in self._entries
+                         if not (e[1] <= ts <= e[2])]
+
+    def clear(self):
+        """Drop all cached ranges."""
+        del self._entries[:]
+
+
+class ProjectIndex(object):
+    """Case-folded, sorted index of the project names.
+
+    Project filters are resolved to the ids of the matching projects with a
+    binary search on the literal prefix of the filter, as SQLite can't use
+    an index for a case-insensitive `LIKE`.  The index is loaded from the
+    project table the first time it is used after the projects change.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+
+        # The folded project names in order, and the parallel project ids.
+        self._keys = None
+        self._ids = None
+
+    def _load(self):
+        p = conn['project'].table
+        query = select([p.columns.name, p.columns.id])
+        rows = sorted((name.lower(), id_)
+                      for name, id_ in conn.executable.execute(query)
+                      if name is not None)
+        self._keys = [key for key, _ in rows]
+        self._ids = [id_ for _, id_ in rows]
+
+    @staticmethod
+    def _parse(filter_):
+        """Split a `LIKE` prefix pattern into its literal prefix and regex.
+
+        :return tuple: The folded prefix, and the compiled regular
+                       expression of the whole pattern or `None` if the
+                       prefix alone decides a match.
+        """
+        prefix = []
+        regex = []
+        wildcard = False
+
+        chars = iter(filter_.lower())
+        for char in chars:
+            if char == '\\':
+                char = next(chars, char)
+                part = re.escape(char)
+            elif char == '%':
+                part = '.*'
+            elif char == '_':
+                part = '.'
+            else:
+                part = re.escape(char)
+
+            if part in ('.*', '.'):
+                wildcard = True
+            elif not wildcard:
+                prefix.append(char)
+            regex.append(part)
+
+        if not wildcard:
+            return u''.join(prefix), None
+        return u''.join(prefix), re.compile(u''.join(regex), re.UNICODE)
+
+    @classmethod
+    def matcher(cls, filter_):
+        """Return a function testing names against a `LIKE` prefix pattern.
+
+        Names are matched like the database matches them, so that results
+        may be narrowed to a more specific filter without a query.
+        """
+        prefix, regex = cls._parse(filter_)
+        if regex is None:
+            return lambda name: (name or u'').lower().startswith(prefix)
+        return lambda name: regex.match((name or u'').lower()) is not None
+
+    def ids(self, filter_):
+        """Return the ids of the projects matching a `LIKE` prefix pattern.
+
+        :param str filter_: The pattern, matched case-insensitively.
+        :return list<int>:
+        """
+        if self._keys is None:
+            self._load()
+
+        prefix, regex = self._parse(filter_)
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_right(self._keys, prefix + u'\uffff', lo)
+
+        if regex is None:
+            return self._ids[lo:hi]
+        return [self._ids[i] for i in xrange(lo, hi)
+                if regex.match(self._keys[i])]
+
+    def invalidate(self):
+        """Reload the index the next time it is used."""
+        self._keys = self._ids = None
+
+
+def _project_id(tx, name):
+    """Return the id of the named project, creating it if needed.
+
+    :param dataset.Database tx: The current transaction.
+    :param str name: The name of the project.
+    :return int:
+    """
+    row = tx['project'].find_one(name=name)
+    if row is None:
+        project_index.invalidate()
+        return tx['project'].insert({'name': name})
+    return row['id']
+
+
+def _project_clause(column, filter_):
+    """Build the clause selecting rows of the projects matching the filter.
+
+    The filter is resolved to the matching project ids once, using the
+    `ProjectIndex`, so that rows are selected by an indexed integer lookup
+    rather than by comparing each of their project names.
+
+    :param sqlalchemy.Column column: The project id column to select on.
+    :param str filter_: A `LIKE` prefix pattern for the project name.
+    """
+    ids = project_index.ids(filter_)
+    if not ids:
+        return false()
+    if len(ids) > MAX_VARIABLES:
+        p = conn['project'].table
+        return column.in_(select([p.columns.id]).where(
+            p.columns.name.ilike(filter_ + '%')))
+    return column.in_(ids)
+
+
+def _project_names():
+    """Return the mapping of project id to project name."""
+    p = conn['project'].table
+    query = select([p.columns.id, p.columns.name])
+    return dict((row[0], row[1]) for row in conn.executable.execute(query))
+
+
+def _select_records(tx):
+    """Build a query for the records, along with the name of their project.
+
+    The columns match the fields of `Record`.
+    """
+    t = tx['record'].table
+    p = tx['project'].table
+    return select([t.columns.id, p.columns.name.label('project'),
+                   t.columns.start, t.columns.elapsed]).select_from(
+                       t.outerjoin(p, t.columns.project_id == p.columns.id))
+
+
+def _range_timestamps(start_date=None, stop_date=None):
+    """Convert an optional range of local dates to epoch seconds (UTC).
+
+    :param datetime start_date: An optional starting date (inclusive)
+    :param datetime stop_date: An optional stopping date (inclusive)
+    :return tuple: The (min_ts, max_ts) bounds, 0 for an open end.
+    """
+    min_ts = timestamp(utc_time(start_date)) if start_date else 0
+    max_ts = timestamp(utc_time(stop_date)) if stop_date else 0
+    return min_ts, max_ts
+
+
+def _record_clauses(table, min_ts=0, max_ts=0, filter_=None):
+    """Build the where clauses selecting records by start time and project.
+
+    :param sqlalchemy.Table table: The record table.
+    :param int min_ts: The minimum start timestamp (inclusive), or 0.
+    :param int max_ts: The maximum start timestamp (inclusive), or 0.
+    :param str filter_: A `LIKE` prefix pattern for the project name.
+    :return list: The clauses, to be combined with `and_`.
+    """
+    clauses = []
+    if min_ts:
+        clauses.append(table.columns.start >= min_ts)
+    if max_ts:
+        clauses.append(table.columns.start <= max_ts)
+    if filter_:
+        clauses.append(_project_clause(table.columns.project_id, filter_))
+    return clauses
+
+
+def _add_to_rollup(tx, project_id, start_ts, elapsed):
+    """Add elapsed seconds to the rollup for the day a record started.
+
+    :param dataset.Database tx: The current transaction.
+    :param int project_id: The id of the project.
+    :param int start_ts: The epoch seconds (UTC) when the record started.
+    :param int elapsed: The number of seconds to add.
+    """
+    if not elapsed:
+        return
+
+    r = tx['rollup'].table
+    day = tx.executable.scalar(select([PERIODS['day'](literal(start_ts))]))
+
+    result = tx.executable.execute(r.update().where(and_(
+        r.columns.day == day, r.columns.project_id == project_id)).values(
+            elapsed=r.columns.elapsed + elapsed))
+    if not result.rowcount:
+        tx.executable.execute(r.insert().values(day=day,
+                                                project_id=project_id,
+                                                elapsed=elapsed))
+
+
+def _batches(iterable, size):
+    """Generate lists of up to `size` consecutive items of the iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _existing_keys(tx, records):
+    """Return the (project id, start) of the stored records among the given.
+
+    The stored records are fetched by the range of start times, which is
+    narrow when the records are imported in chronological order.
+
+    :param dataset.Database tx: The current transaction.
+    :param list<Record> records: The records to look for.
+    :return set:
+    """
+    t = tx['record'].table
+    starts = set(record.start for record in records)
+
+    query = select([t.columns.project_id, t.columns.start]).where(and_(
+        *_record_clauses(t, min(starts), max(starts))))
+    return set((row[0], row[1]) for row in tx.executable.execute(query)
+               if row[1] in starts)
+
+
+cache = RangeCache()
+project_index = ProjectIndex()
 
 
 class ProjectService(object):
     """Service instance for maintaining the list of projects."""
 
     def create(self, name):
-        """Create a new project with the given name."""
+        """Create a new project with the given name, unless it exists."""
 
         log.debug("create: %s", name)
 
         with conn as tx:
-            tx['project'].insert({'name': name})
+            _project_id(tx, name)
 
     def list(self):
         """Query for a list of all projects.
@@ -50,78 +453,152 @@ class ProjectService(object):
         :return list<dict>: A list of rows from the database.
         """
 
-        with conn as tx:
-            return tx['project'].all()
+        return conn['project'].all()
 
     def delete(self, **filter):
         """Delete the project by either id or name.
 
+        Projects with records are kept, so that no recorded time is lost.
+
         :param filter: keyword arguments either 'id' or 'name' to narow the
                        list of projects to delete.
+        :raises ValueError: If any of the projects has records.
         """
 
         with conn as tx:
+            rows = list(tx['project'].find(**filter))
+            names = [row['name'] for row in rows]
+            ids = [row['id'] for row in rows]
+
+            t = tx['record'].table
+            r = tx['rollup'].table
+            for i in xrange(0, len(ids), MAX_VARIABLES):
+                chunk = ids[i:i + MAX_VARIABLES]
+                query = select([func.count()]).where(
+                    t.columns.project_id.in_(chunk))
+                if tx.executable.execute(query).scalar():
+                    raise ValueError("%s has recorded time" %
+                                     ", ".join(names))
+
+            for i in xrange(0, len(ids), MAX_VARIABLES):
+                tx.executable.execute(r.delete().where(
+                    r.columns.project_id.in_(ids[i:i + MAX_VARIABLES])))
             tx['project'].delete(**filter)
 
+        project_index.invalidate()
+
 
 class RecordService(object):
     """Service instance for maintaining the actual time records."""
 
     def start(self, project, ts):
-        """Start a new time record.
+        """Start a new time record, which becomes the active session.
 
         :param str project: The name of the project.
         :param int ts: The current epoch seconds (UTC).
+        :return int: The id of the new record.
         """
         log.debug("start: project=%s timestamp=%s", project, ts)
 
         with conn as tx:
-            tx['record'].insert(dict(project=project, start=ts, elapsed=0))
+            record_id = tx['record'].insert(dict(
+                project_id=_project_id(tx, project),
+                start=ts,
+                elapsed=0))
 
-    def stop(self, project, start_ts, stop_ts):
-        """Stop the current time record.
+            session = tx['session'].table
+            tx.executable.execute(session.delete())
+            tx.executable.execute(session.insert().values(record_id=record_id))
+
+        cache.invalidate(ts)
+        return record_id
+
+    def stop(self, project=None, start_ts=None, stop_ts=None, record_id=None):
+        """Stop an ongoing time record, by default the active session.
+
+        The record is looked up by its id if given, otherwise by its project
+        and start time if given, otherwise it is the active session.  A
+        record which was already stopped is left as it is.
 
         :param str project: The name of the project.
         :param int start_ts: The epoch seconds (UTC) when the record was
                              started.
         :param int stop_ts: The epoch seconds (UTC) when the record is to be
-                            stopped.
+                            stopped, defaults to the current time.
+        :param int record_id: The id of the record, as returned by `start()`.
         """
 
-        log.debug("stop: project=%s start_ts=%s stop_ts=%s", project, start_ts,
-                  stop_ts)
+        log.debug("stop: project=%s start_ts=%s stop_ts=%s record_id=%s",
+                  project, start_ts, stop_ts, record_id)
+
+        stop_ts = int(time.time()) if stop_ts is None else stop_ts
 
         with conn as tx:
-            tx['record'].update(
-                dict(project=project,
-                     start=start_ts,
-                     elapsed=stop_ts - start_ts), ['project', 'start'])
+            session = tx['session'].table
+            active_id = tx.executable.scalar(select([
+                session.columns.record_id]).limit(1))
+
+            if record_id is None and project is not None:
+                # The project is not created if it doesn't exist.
+                found = tx['project'].find_one(name=project)
+                row = None
+                if found is not None:
+                    row = tx['record'].find_one(project_id=found['id'],
+                                                start=start_ts)
+                record_id = row['id'] if row is not None else None
+            elif record_id is None:
+                record_id = active_id
+
+            previous = tx['record'].find_one(id=record_id)
+            if previous is None:
+                log.warning("No record to stop")
+                return
+            if previous['elapsed'] and record_id != active_id:
+                log.warning("Record %s was already stopped", record_id)
+                return
+
+            t = tx['record'].table
+            elapsed = stop_ts - previous['start']
+            tx.executable.execute(t.update().where(
+                t.columns.id == record_id).values(elapsed=elapsed))
+            tx.executable.execute(session.delete().where(
+                session.columns.record_id == record_id))
+
+            # Only the change in elapsed time is added to the rollup, in case
+            # the record had already been stopped.
+            _add_to_rollup(tx, previous['project_id'], previous['start'],
+                           elapsed - (previous['elapsed'] or 0))
+
+        cache.invalidate(previous['start'])
 
     def list(self):
         """Qurey for a list of all records.
 
         The return value will be a list of `collections.ordereddict` objects,
-        each containing the following fields: id, start, elapsed.
+        each containing the following fields: id, project, start, elapsed.
 
         :return list<dict>: The result set.
         """
 
-        with conn as tx:
-            return tx['record'].all()
+        return conn.query(_select_records(conn))
 
     def ongoing(self):
-        """Query for the last ongoing recording.
+        """Query for the active session.
 
-        A recording is considered ongoing if the `elapsed` field is set to
-        0 seconds.
+        The record started last, and not stopped since, is tracked in the
+        session table so that it is found without searching the records.
 
-        :return collections.ordereddict: The last started ongoing row or
+        :return collections.ordereddict: The row of the ongoing record, or
                                          `None` if there is no ongoing
-                                         records.
+                                         record.
         """
-        with conn as tx:
-            last = tx['record'].find_one(elapsed=0, order_by='-start')
-            return last
+        t = conn['record'].table
+        session = conn['session'].table
+        active = select([session.columns.record_id]).limit(1).as_scalar()
+        for row in conn.query(_select_records(conn).where(
+                t.columns.id == active)):
+            return row
+        return None
 
     def by_day(self, start_date=None, stop_date=None, filter_=None):
         """Query for records grouped by day.
@@ -137,46 +614,328 @@ class RecordService(object):
         :return collections.ordereddict.
         """
 
-        start_date = utc_time(start_date) if start_date else None
-        stop_date = utc_time(stop_date) if stop_date else None
-
-        with conn as tx:
-            min_ts = timestamp(start_date) if start_date is not None else 0
-            max_ts = timestamp(stop_date) if stop_date is not None else 0
-
-            data = collections.defaultdict(list)
-            t = tx['record']
-            try:
-                if filter_ and min_ts and max_ts:
-                    rows = t.find(and_(t.table.columns.start >= min_ts,
-                                       t.table.columns.start <= max_ts,
-                                       t.table.columns.project.ilike(filter_ +
-                                                                     '%')))
-                elif min_ts and max_ts:
-                    rows = t.find(and_(t.table.columns.start >= min_ts,
-                                       t.table.columns.start <= max_ts))
-                elif min_ts:
-                    rows = t.find(t.table.columns.start >= min_ts)
-                elif max_ts:
-                    rows = t.find(t.table.colunms.start <= max_ts)
-                else:
-                    rows = t.all()
-
-            except AttributeError:
-                rows = []
+        min_ts, max_ts = _range_timestamps(start_date, stop_date)
 
-            for row in rows:
-                try:
-                    ts = local_time(datetime.utcfromtimestamp(float(row[
-                        'start'])))
-                except TypeError:
-                    continue
+        records = self._records(min_ts, max_ts, filter_)
 
-                data[ts.date()].append({
-                    'project': row['project'],
-                    'start_ts': row['start'],
-                    'stop_ts': row['start'] + row['elapsed'],
-                    'elapsed': row['elapsed'],
-                })
+        data = collections.defaultdict(list)
 
+        starts = [record.start for record in records
+                  if record.start is not None]
+        if not starts:
             return data
+
+        # The records are ordered by start time.
+        converter = LocalTimeConverter(starts[0], starts[-1])
+
+        for record in records:
+            if record.start is None:
+                continue
+
+            data[converter.date(record.start)].append({
+                'project': record.project,
+                'start_ts': record.start,
+                'stop_ts': record.stop,
+                'elapsed': record.elapsed,
+            })
+
+        return data
+
+    def records(self, start_date=None, stop_date=None, filter_=None):
+        """Query for a list of the records started within the given range.
+
+        :param datetime start_date: An optional starting date (inclusive)
+        :param datetime stop_date: An optional stopping date (inclusive)
+        :param str filter_: filter string for projects.
+        :return list<Record>: The records ordered by start time.
+        """
+
+        min_ts, max_ts = _range_timestamps(start_date, stop_date)
+
+        return self._records(min_ts, max_ts, filter_)
+
+    def _records(self, min_ts, max_ts, filter_):
+        """Query for the records with a start time within the timestamps."""
+
+        # Any range already fetched by another report, e.g. the month which
+        # contains this week, is served from the cache.
+        records = cache.get(min_ts, max_ts, filter_)
+        if records is None:
+            records = list(self._iter_records(min_ts, max_ts, filter_))
+            cache.put(min_ts, max_ts, filter_, records)
+        return records
+
+    def iter_records(self,
+                     start_date=None,
+                     stop_date=None,
+                     filter_=None,
+                     batch_size=BATCH_SIZE):
+        """Stream the records started within the given range.
+
+        Rows are fetched from the cursor `batch_size` at a time and yielded
+        as `Record` tuples ordered by start time, so memory use does not
+        depend on the size of the range.
+
+        :param datetime start_date: An optional starting date (inclusive)
+        :param datetime stop_date: An optional stopping date (inclusive)
+        :param str filter_: filter string for projects.
+        :param int batch_size: The number of rows fetched at a time.
+        :return generator<Record>:
+        """
+
+        min_ts, max_ts = _range_timestamps(start_date, stop_date)
+
+        return self._iter_records(min_ts, max_ts, filter_, batch_size)
+
+    def _iter_records(self, min_ts, max_ts, filter_, batch_size=BATCH_SIZE):
+        """Stream the records with a start time within the timestamps."""
+
+        t = conn['record'].table
+        query = _select_records(conn)
+        clauses = _record_clauses(t, min_ts, max_ts, filter_)
+        if clauses:
+            query = query.where(and_(*clauses))
+        query = query.order_by(t.columns.start)
+
+        # Reads are not wrapped in a transaction, so that a long running
+        # iteration doesn't hold back writes made while it is consumed.
+        result = conn.executable.execution_options(
+            stream_results=True).execute(query)
+        try:
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield Record(*row)
+        finally:
+            result.close()
+
+    def totals(self,
+               start_date=None,
+               stop_date=None,
+               filter_=None,
+               period=None,
+               now=None):
+        """Query for the total elapsed time per project.
+
+        The aggregation is done in the database, so only the totals are
+        returned regardless of how many records are in the range.  Ongoing
+        records are counted up until `now`.
+
+        :param datetime start_date: An optional starting date (inclusive)
+        :param datetime stop_date: An optional stopping date (inclusive)
+        :param str filter_: filter string for projects.
+        :param str period: Optionally also group by 'day', 'week' or 'month'
+                           in local time.
+        :param int now: The current epoch seconds (UTC), defaults to the
+                        current time.
+        :return list<dict>: One entry per project (and period) with the keys
+                            "project", "elapsed", and "period" if grouping
+                            by period, which is the `date` that starts it.
+        """
+
+        now = int(time.time()) if now is None else now
+        min_ts, max_ts = _range_timestamps(start_date, stop_date)
+
+        t = conn['record'].table
+        elapsed = case([(t.columns.elapsed == 0, now - t.columns.start)],
+                       else_=t.columns.elapsed)
+
+        # Grouping by the integer project id is cheaper than joining the
+        # names of each record, which are looked up once afterwards.
+        group_by = [t.columns.project_id]
+        if period is not None:
+            group_by.insert(0, PERIODS[period](t.columns.start).label(
+                'period'))
+
+        query = select(group_by + [func.sum(elapsed).label('elapsed')])
+        clauses = _record_clauses(t, min_ts, max_ts, filter_)
+        if clauses:
+            query = query.where(and_(*clauses))
+        query = query.group_by(*group_by)
+
+        names = _project_names()
+        totals = []
+        for row in conn.query(query):
+            entry = {'project': names.get(row['project_id']),
+                     'elapsed': row['elapsed']}
+            if period is not None:
+                entry['period'] = datetime.strptime(row['period'],
+                                                    '%Y-%m-%d').date()
+            totals.append(entry)
+
+        totals.sort(key=lambda entry: (entry.get('period'), entry['project']))
+        return totals
+
+    def rollup_totals(self,
+                      start_date=None,
+                      stop_date=None,
+                      filter_=None,
+                      now=None):
+        """Query for the total elapsed time per project using the rollups.
+
+        Stopped records are read from the daily rollup table, so the cost
+        depends on the number of days in the range rather than the number
+        of records.  Ongoing records are counted up until `now`.  The
+        range is expected to cover whole local days.
+
+        :param datetime start_date: An optional starting date (inclusive)
+        :param datetime stop_date: An optional stopping date (inclusive)
+        :param str filter_: filter string for projects.
+        :param int now: The current epoch seconds (UTC), defaults to the
+                        current time.
+        :return list<dict>: One entry per project with the keys "project"
+                            and "elapsed", as returned by `totals()`.
+        """
+
+        now = int(time.time()) if now is None else now
+        timesheet = collections.defaultdict(int)
+
+        names = _project_names()
+
+        r = conn['rollup'].table
+        query = select([r.columns.project_id,
+                        func.sum(r.columns.elapsed).label('elapsed')])
+        if start_date is not None:
+            query = query.where(
+                r.columns.day >= start_date.date().isoformat())
+        if stop_date is not None:
+            query = query.where(
+                r.columns.day <= stop_date.date().isoformat())
+        if filter_:
+            query = query.where(_project_clause(r.columns.project_id,
+                                                filter_))
+
+        for row in conn.query(query.group_by(r.columns.project_id)):
+            timesheet[names.get(row['project_id'])] += row['elapsed']
+
+        min_ts, max_ts = _range_timestamps(start_date, stop_date)
+
+        t = conn['record'].table
+        clauses = _record_clauses(t, min_ts, max_ts, filter_)
+        clauses.append(t.columns.elapsed == 0)
+        query = select([t.columns.project_id, t.columns.start]).where(and_(
+            *clauses))
+
+        for row in conn.query(query):
+            timesheet[names.get(row['project_id'])] += now - row['start']
+
+        return [{'project': project, 'elapsed': elapsed}
+                for project, elapsed in sorted(timesheet.iteritems())]
+
+    def rebuild_rollups(self, start_date=None, stop_date=None):
+        """Regenerate the daily rollup table from the raw records.
+
+        This is only needed if the rollups have gone out of sync, e.g. after
+        editing records by hand or changing the local timezone.
+
+        :param datetime start_date: Only rebuild from this day (inclusive).
+        :param datetime stop_date: Only rebuild up to this day (inclusive).
+        """
+
+        log.info("Rebuilding the daily rollups")
+
+        with conn as tx:
+            r = tx['rollup'].table
+            t = tx['record'].table
+            day = PERIODS['day'](t.columns.start)
+
+            delete = r.delete()
+            clauses = [t.columns.elapsed > 0]
+            if start_date is not None:
+                delete = delete.where(
+                    r.columns.day >= start_date.date().isoformat())
+                clauses.append(t.columns.start >= timestamp(utc_time(
+                    start_of_day(start_date))))
+            if stop_date is not None:
+                delete = delete.where(
+                    r.columns.day <= stop_date.date().isoformat())
+                clauses.append(t.columns.start <= timestamp(utc_time(
+                    end_of_day(stop_date))))
+
+            tx.executable.execute(delete)
+            tx.executable.execute(r.insert().from_select(
+                ['day', 'project_id', 'elapsed'],
+                select([day, t.columns.project_id, func.sum(t.columns.elapsed)
+                        ]).where(and_(*clauses)).group_by(
+                            day, t.columns.project_id)))
+
+    def import_records(self,
+                       records,
+                       batch_size=IMPORT_BATCH_SIZE,
+                       progress=None):
+        """Insert many stopped records at once, e.g. from another tool.
+
+        Records with the same project and start time as a stored record, or
+        as an earlier one in the input, are skipped.  Missing projects are
+        created.  Each batch is inserted in its own transaction with a single
+        `executemany`, and the rollups of the days covered are rebuilt once
+        all batches are inserted.
+
+        :param iterable<Record> records: The records to insert, their `id`
+                                         is ignored.
+        :param int batch_size: The number of records per transaction.
+        :param callable progress: Called with the counts after each batch.
+        :return dict: The number of records "read", "inserted" and skipped
+                      as "duplicates", and of "projects" created.
+        """
+
+        counts = collections.OrderedDict([('read', 0), ('inserted', 0),
+                                          ('duplicates', 0), ('projects', 0)])
+        projects = dict((row['name'], row['id'])
+                        for row in conn['project'].all())
+        min_ts = max_ts = None
+
+        for batch in _batches(records, batch_size):
+            counts['read'] += len(batch)
+
+            with conn as tx:
+                missing = sorted(set(r.project for r in batch) - set(projects))
+                if missing:
+                    p = tx['project'].table
+                    tx.executable.execute(p.insert(),
+                                          [{'name': name} for name in missing])
+                    for i in xrange(0, len(missing), MAX_VARIABLES):
+                        query = select([p.columns.name, p.columns.id]).where(
+                            p.columns.name.in_(missing[i:i + MAX_VARIABLES]))
+                        projects.update(
+                            (row[0], row[1])
+                            for row in tx.executable.execute(query))
+                    counts['projects'] += len(missing)
+                    project_index.invalidate()
+
+                seen = _existing_keys(tx, batch)
+                rows = []
+                for record in batch:
+                    key = projects[record.project], record.start
+                    if key in seen:
+                        counts['duplicates'] += 1
+                        continue
+                    seen.add(key)
+                    rows.append({'project_id': key[0],
+                                 'start': record.start,
+                                 'elapsed': record.elapsed})
+
+                if rows:
+                    tx.executable.execute(tx['record'].table.insert(), rows)
+
+            if rows:
+                counts['inserted'] += len(rows)
+                starts = [row['start'] for row in rows]
+                min_ts = min(starts + ([min_ts] if min_ts else []))
+                max_ts = max(starts + ([max_ts] if max_ts else []))
+
+            if progress is not None:
+                progress(counts)
+
+        if counts['inserted']:
+            cache.clear()
+            self.rebuild_rollups(datetime.fromtimestamp(min_ts),
+                                 datetime.fromtimestamp(max_ts))
+
+        return counts
+
+
+instrument.methods(ProjectService)
+instrument.methods(RecordService)
@@ -1,32 +1,139 @@
 # Copyright (C) 2017, Anthony Oteri
 # All rights reserved.
-"""Global event handler."""
+"""Topic based event bus.
+
+Callbacks subscribe to one or more topics, and are notified whenever an
+event is published on any of them.  Bursts of events are coalesced, so that
+each subscriber is called at most once per dispatch, and dispatches are
+deferred until the UI is idle once a scheduler has been installed.
+
+Subscribers are held by weak reference, so subscribing does not keep a
+widget alive.
+"""
 
 from __future__ import absolute_import
 
+import collections
+import logging
+import weakref
 from functools import wraps
 
-_callbacks = set()
+from chronos import instrument
+
+log = logging.getLogger(__name__)
+
+PROJECTS_CHANGED = 'projects.changed'
+RECORD_STARTED = 'record.started'
+RECORD_STOPPED = 'record.stopped'
+SELECTION_CHANGED = 'selection.changed'
+
+TOPICS = (PROJECTS_CHANGED, RECORD_STARTED, RECORD_STOPPED, SELECTION_CHANGED)
+
+# Mapping of topic to the weak references of its subscribers.
+_subscribers = collections.defaultdict(list)
+
+# The subscribers waiting to be called on the next dispatch, in order.
+_pending = collections.OrderedDict()
+
+# A callable used to defer the dispatch, e.g. `tk.Tk.after_idle`.
+_scheduler = None
+_scheduled = False
+
+
+class _WeakCallback(object):
+    """A weak reference to a function or bound method."""
+
+    def __init__(self, fn):
+        obj = getattr(fn, '__self__', None)
+        if obj is not None:
+            self.ref = weakref.ref(obj)
+            self.func = fn.__func__
+        else:
+            self.ref = weakref.ref(fn)
+            self.func = None
+
+    @property
+    def key(self):
+        return self.ref, self.func
+
+    def __call__(self):
+        """Return the live callable, or `None` if it has been collected."""
+        target = self.ref()
+        if target is None or self.func is None:
+            return target
+        return self.func.__get__(target, type(target))
+
+
+def set_scheduler(scheduler):
+    """Defer dispatching to the given callable, e.g. `tk.Tk.after_idle`.
+
+    Without a scheduler, events are dispatched as soon as they are
+    published.
+    """
+    global _scheduler
+    _scheduler = scheduler
+
+
+def register(fn, *topics):
+    """Subscribe a callable to the given topics, or to all topics."""
+    callback = _WeakCallback(fn)
+    for topic in topics or TOPICS:
+        if callback.key not in [cb.key for cb in _subscribers[topic]]:
+            _subscribers[topic].append(callback)
+
+
+def publish(*topics):
+    """Queue the subscribers of the given topics to be notified."""
+    global _scheduled
+
+    for topic in topics:
+        subscribers = _subscribers[topic]
+        subscribers[:] = [cb for cb in subscribers if cb() is not None]
+        for callback in subscribers:
+            _pending[callback.key] = callback
+
+    if not _pending or _scheduled:
+        return
+
+    if _scheduler is None:
+        dispatch()
+    else:
+        _scheduled = True
+        _scheduler(dispatch)
+
+
+@instrument.timed('event.dispatch')
+def dispatch():
+    """Call each of the pending subscribers once."""
+    global _scheduled
+    _scheduled = False
 
+    while _pending:
+        _, callback = _pending.popitem(last=False)
+        fn = callback()
+        if fn is None:
+            continue
+        try:
+            fn()
+        except Exception:
+            log.exception("Error notifying %r", fn)
 
-def notify(fn):
-    """After executing the supplied function, notify all callbacks."""
 
-    @wraps(fn)
-    def wrapper(*args, **kwargs):
-        result = fn(*args, **kwargs)
-        for cb in _callbacks:
-            cb()
-        return result
+def notify(*topics):
+    """After executing the decorated function, publish the given topics."""
 
-    return wrapper
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            publish(*topics)
+            return result
 
+        return wrapper
 
-def register(fn):
-    """Register a callable to be notified."""
-    _callbacks.add(fn)
+    return decorator
 
 
-@notify
 def trigger():
-    pass
+    """Publish all topics, e.g. to populate the UI at startup."""
+    publish(*TOPICS)
@@ -0,0 +1,102 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Streaming export of the raw time records to CSV or JSON Lines.
+
+Records are read from the database cursor in batches, and each batch is
+formatted into a single buffer before being written, so memory use does
+not depend on the size of the export.  The start and stop times are epoch
+seconds (UTC), which `chronos import` reads back.
+"""
+
+from __future__ import absolute_import
+
+import csv
+import itertools
+import json
+import logging
+from cStringIO import StringIO
+
+from chronos import utils
+from chronos.db import BATCH_SIZE, RecordService
+from chronos.report import like_pattern
+
+log = logging.getLogger(__name__)
+
+FIELDS = ('id', 'project', 'start', 'stop', 'elapsed')
+
+
+def _chunks(records, size):
+    """Generate lists of rows, with up to `size` records each."""
+    records = iter(records)
+    while True:
+        chunk = [(r.id, r.project, r.start, r.stop if r.elapsed else None,
+                  r.elapsed) for r in itertools.islice(records, size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(records, out, chunk_size=BATCH_SIZE):
+    """Write the records as CSV with a header row.
+
+    :return int: The number of records written.
+    """
+    count = 0
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(FIELDS)
+
+    for chunk in _chunks(records, chunk_size):
+        writer.writerows([[utils.encode(value) for value in row]
+                          for row in chunk])
+        out.write(buf.getvalue())
+        buf.seek(0)
+        buf.truncate()
+        count += len(chunk)
+
+    out.write(buf.getvalue())
+    return count
+
+
+def write_json(records, out, chunk_size=BATCH_SIZE):
+    """Write the records as JSON Lines, with one object per record.
+
+    :return int: The number of records written.
+    """
+    count = 0
+    for chunk in _chunks(records, chunk_size):
+        out.write("".join(json.dumps(dict(zip(FIELDS, row)), sort_keys=True) +
+                          "\n" for row in chunk))
+        count += len(chunk)
+    return count
+
+
+FORMATS = {
+    'csv': write_csv,
+    'json': write_json,
+}
+
+
+def export(out,
+           fmt='csv',
+           start_date=None,
+           stop_date=None,
+           filter_=None,
+           record_service=None):
+    """Stream the records started within the range to a file.
+
+    :param file out: The file to write to.
+    :param str fmt: The output format, one of `FORMATS`.
+    :param datetime start_date: An optional starting date (inclusive)
+    :param datetime stop_date: An optional stopping date (inclusive)
+    :param str filter_: filter string for projects, using * wildcards.
+    :param RecordService record_service: The service to query.
+    :return int: The number of records written.
+    """
+    record_service = record_service or RecordService()
+    records = record_service.iter_records(start_date=start_date,
+                                          stop_date=stop_date,
+                                          filter_=like_pattern(filter_))
+    count = FORMATS[fmt](records, out)
+    log.debug("Exported %d records", count)
+    return count
@@ -0,0 +1,169 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Bulk import of time records from CSV or JSON Lines.
+
+Each row holds a `project`, a `start` and either the `elapsed` seconds or a
+`stop`.  Times are given either as epoch seconds (UTC), as ISO 8601 local
+date and times, or as local times of the day along with a `date` column, so
+that the ledgers written by `chronos report` can be imported again.
+"""
+
+from __future__ import absolute_import
+
+import csv
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from chronos.db import Record, RecordService
+
+log = logging.getLogger(__name__)
+
+# Only the first invalid rows are logged individually.
+MAX_WARNINGS = 20
+
+DATETIME_FORMATS = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S',
+                    '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M')
+TIME_FORMATS = ('%H:%M:%S', '%H:%M')
+
+
+def _parse(value, formats):
+    """Parse the value with the first of the formats which matches."""
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError("%r is not a recognized date or time" % value)
+
+
+def _local_timestamp(dt):
+    """Return the epoch seconds (UTC) of a local datetime."""
+    return int(time.mktime(dt.timetuple()))
+
+
+def parse_time(value, day=None):
+    """Parse a point in time as epoch seconds (UTC).
+
+    :param value: Epoch seconds, a local ISO 8601 date and time, or a local
+                  time of the day.
+    :param str day: The ISO 8601 date for a time of the day.
+    :return int:
+    """
+    if isinstance(value, (int, long, float)):
+        return int(value)
+
+    value = value.strip()
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+
+    if day:
+        try:
+            clock = _parse(value, TIME_FORMATS).time()
+        except ValueError:
+            pass
+        else:
+            day = datetime.strptime(day.strip(), '%Y-%m-%d').date()
+            return _local_timestamp(datetime.combine(day, clock))
+
+    return _local_timestamp(_parse(value, DATETIME_FORMATS))
+
+
+def parse_row(row):
+    """Convert a row of the input into a stopped `Record`.
+
+    :param dict row: The row, with the keys described in the module.
+    :return Record:
+    :raises ValueError: If the row is incomplete or inconsistent.
+    """
+    project = row.get('project')
+    if not project or not project.strip():
+        raise ValueError("missing project")
+
+    start = row.get('start')
+    if start in (None, ''):
+        raise ValueError("missing start")
+    day = row.get('date')
+    start_ts = parse_time(start, day)
+
+    elapsed = row.get('elapsed')
+    stop = row.get('stop')
+    if elapsed not in (None, ''):
+        elapsed = int(float(elapsed))
+    elif stop not in (None, ''):
+        stop_ts = parse_time(stop, day)
+        # A stop given as a time of the day may fall on the next day.
+        if day and stop_ts < start_ts:
+            stop_ts = _local_timestamp(
+                datetime.fromtimestamp(stop_ts) + timedelta(days=1))
+        elapsed = stop_ts - start_ts
+    else:
+        raise ValueError("missing elapsed or stop")
+
+    if elapsed <= 0:
+        raise ValueError("elapsed time must be positive")
+
+    return Record(None, project.strip(), start_ts, elapsed)
+
+
+def read_csv(f):
+    """Generate the rows of a CSV file with a header row as dicts."""
+    reader = csv.reader(f)
+    header = next(reader, [])
+    for row in reader:
+        yield dict(zip(header, [value.decode('utf-8') for value in row]))
+
+
+def read_json(f):
+    """Generate the objects of a JSON Lines file, skipping blank lines."""
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+FORMATS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+class Import(object):
+    """An import of the rows read from a file."""
+
+    def __init__(self, rows, record_service=None):
+        """Describe the import, nothing is read until `run()`.
+
+        :param iterable<dict> rows: The rows, e.g. from `read_csv()`.
+        :param RecordService record_service: The service to insert with.
+        """
+        self.rows = rows
+        self.record_service = record_service or RecordService()
+        self.invalid = 0
+
+    def records(self):
+        """Generate the valid rows as records, counting the invalid ones."""
+        for line, row in enumerate(self.rows, 1):
+            try:
+                yield parse_row(row)
+            except (AttributeError, TypeError, ValueError) as e:
+                self.invalid += 1
+                if self.invalid <= MAX_WARNINGS:
+                    log.warning("Skipping row %d: %s", line, e)
+
+    def run(self, batch_size=None, progress=None):
+        """Insert the records, see `RecordService.import_records()`.
+
+        :return dict: The counts, including the "invalid" rows.
+        """
+        kwargs = {'progress': progress}
+        if batch_size:
+            kwargs['batch_size'] = batch_size
+
+        counts = self.record_service.import_records(self.records(), **kwargs)
+        counts['invalid'] = self.invalid
+        if self.invalid > MAX_WARNINGS:
+            log.warning("Skipped %d invalid rows", self.invalid)
+        return counts
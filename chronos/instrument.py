@@ -0,0 +1,165 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Lightweight timing instrumentation.
+
+Instrumented functions record their call count and a histogram of their
+latency.  Whether a function is instrumented is decided when it is
+decorated, so instrumentation must be enabled before the instrumented
+modules are imported.  When disabled, functions are left untouched and
+cost nothing extra.
+"""
+
+from __future__ import absolute_import, division
+
+import json
+import logging
+import time
+from functools import wraps
+
+log = logging.getLogger(__name__)
+
+enabled = False
+
+# The upper bounds of the latency histogram buckets, in milliseconds.  The
+# last bucket holds everything slower.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Mapping of name to `Stats`.
+stats = {}
+
+
+class Stats(object):
+    """Call count and latency histogram of an instrumented function."""
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, seconds):
+        """Record a call which took the given number of seconds."""
+        ms = seconds * 1000
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """Estimate the latency percentile as the bound of its bucket."""
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total,
+            'mean_ms': self.mean,
+            'max_ms': self.max,
+            'buckets_ms': list(BUCKETS_MS),
+            'histogram': list(self.buckets),
+        }
+
+
+def enable():
+    """Enable instrumentation of the functions decorated from now on."""
+    global enabled
+    enabled = True
+
+
+def record(name, seconds):
+    """Record a call to the named function."""
+    try:
+        entry = stats[name]
+    except KeyError:
+        entry = stats[name] = Stats()
+    entry.add(seconds)
+
+
+def timed(name):
+    """Decorate a function to record its latency under the given name."""
+
+    def decorator(fn):
+        if not enabled:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.time() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def methods(cls, names=None):
+    """Instrument the methods of a class.
+
+    The methods are recorded under the name of the class of the instance
+    they are called on, so that subclasses are told apart.
+
+    :param cls: The class to instrument.
+    :param list names: The method names, defaults to all public methods.
+    """
+    if not enabled:
+        return cls
+
+    if names is None:
+        names = [n for n in dir(cls)
+                 if not n.startswith('_') and callable(getattr(cls, n))]
+
+    for method_name in names:
+        fn = getattr(cls, method_name).__func__
+        setattr(cls, method_name, _method_wrapper(fn, method_name))
+
+    return cls
+
+
+def _method_wrapper(fn, method_name):
+
+    @wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        start = time.time()
+        try:
+            return fn(self, *args, **kwargs)
+        finally:
+            record('%s.%s' % (self.__class__.__name__, method_name),
+                   time.time() - start)
+
+    return wrapper
+
+
+def reset():
+    """Forget everything recorded so far."""
+    stats.clear()
+
+
+def dump(out):
+    """Write the recorded statistics as JSON to a file object."""
+    json.dump(dict((name, entry.as_dict())
+                   for name, entry in stats.iteritems()),
+              out,
+              indent=2,
+              sort_keys=True)
+    out.write("\n")
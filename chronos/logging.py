@@ -1,15 +1,59 @@
 # Copyright (C) 2017, Anthony Oteri
 # All rights reserved
-"""Handle capturing the log to an internal variable."""
+"""Handle capturing the log to an internal ring buffer."""
 
 from __future__ import absolute_import
 
+import collections
 import logging as python_logging
-from StringIO import StringIO
 
 MAX_LINES = 100
+
+# The number of log records retained in memory.
+CAPACITY = 1000
+
 log = python_logging.getLogger()  # Get the root logger
-buffer = StringIO()
+
+
+class RingBufferHandler(python_logging.Handler):
+    """Log handler keeping the most recent formatted records in memory.
+
+    Each record is numbered with an increasing sequence number, so that
+    consumers can fetch only what was logged since they last looked.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        python_logging.Handler.__init__(self)
+        self.records = collections.deque(maxlen=capacity)
+        self.sequence = 0
+
+    def emit(self, record):
+        try:
+            message = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        self.sequence += 1
+        self.records.append((self.sequence, message))
+
+    def since(self, sequence):
+        """Return the (sequence, message) pairs newer than `sequence`."""
+        self.acquire()
+        try:
+            newer = []
+            for entry in reversed(self.records):
+                if entry[0] <= sequence:
+                    break
+                newer.append(entry)
+        finally:
+            self.release()
+
+        newer.reverse()
+        return newer
+
+
+handler = RingBufferHandler()
 
 
 def init(level):
@@ -17,13 +61,16 @@ def init(level):
 
     python_logging.basicConfig(level=level)
 
-    global buffer
-    console_handler = python_logging.StreamHandler(buffer)
-    console_handler.setLevel(level)
-    log.addHandler(console_handler)
+    handler.setLevel(level)
+    log.addHandler(handler)
 
 
 def fetch(lines=MAX_LINES):
     """Fetch the last `lines` lines of the log file."""
-    current = buffer.getvalue().splitlines()[-lines:]
+    current = [message for _, message in handler.since(0)][-lines:]
     return '\n'.join(current)
+
+
+def fetch_since(sequence):
+    """Fetch the (sequence, message) pairs logged after `sequence`."""
+    return handler.since(sequence)
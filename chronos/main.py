@@ -5,16 +5,29 @@
 from __future__ import absolute_import
 
 import argparse
+import atexit
 import logging
+import sys
+import time
+from datetime import datetime
 
-from chronos import config
+from chronos import instrument, startup
 import chronos.logging
 
-from chronos.application import Application
-from chronos.db import connect
-
 log = logging.getLogger('chronos')
 
+# The output formats of the report command, see `chronos.report.FORMATS`.
+REPORT_FORMATS = ('csv', 'json', 'text')
+
+# The input formats of the import command, see `chronos.importer.FORMATS`,
+# and output formats of the export command, see `chronos.export.FORMATS`.
+IMPORT_FORMATS = ('csv', 'json')
+
+# The minimum number of seconds between progress reports of an import.
+PROGRESS_INTERVAL = 1
+
+COMMANDS = ('gui', 'report', 'import', 'export', 'rebuild-rollups')
+
 
 def _log_level(level):
     return {
@@ -25,8 +38,141 @@ def _log_level(level):
     }[level]
 
 
-def main():
-    """"Main entrypoint."""
+def _date(value):
+    """Parse a date given on the command line in YYYY-MM-DD format."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError("%r is not a YYYY-MM-DD date" %
+                                         value)
+
+
+def _connect():
+    """Connect to the database, importing the database layer on demand."""
+    from chronos.db import connect
+    startup.mark('import db (dataset, SQLAlchemy)')
+
+    connect()
+    startup.mark('connect database')
+
+
+def _dump_instrumentation(filename):
+    """Write the recorded latencies to the given file."""
+    with open(filename, 'w') as out:
+        instrument.dump(out)
+
+
+def gui(options):
+    """Start the graphical user interface.
+
+    The window is shown before connecting to the database.
+    """
+
+    # Tkinter is only imported when needed, so that the other commands can
+    # run on hosts without a display.
+    from chronos.application import Application
+    startup.mark('import application (Tkinter, ui)')
+
+    app = Application(connect=_connect)
+    app.run()
+
+
+def print_report(options):
+    """Print a report for a range of dates to stdout.
+
+    The rows are written as they are read from the database, so that the
+    output of large ranges starts straight away.
+    """
+    _connect()
+
+    from chronos import report, utils
+
+    timesheet = report.Timesheet(utils.start_of_day(options.from_),
+                                 utils.end_of_day(options.to),
+                                 filter_=options.filter,
+                                 summary=options.summary,
+                                 use_rollups=options.summary)
+    timesheet.load(stream=True)
+    report.FORMATS[options.format](timesheet, sys.stdout)
+    startup.mark('report')
+
+
+def rebuild_rollups(options):
+    """Regenerate the daily rollups from the raw records."""
+    _connect()
+
+    from chronos.db import RecordService
+    RecordService().rebuild_rollups()
+    startup.mark('rebuild rollups')
+
+
+def import_records(options):
+    """Import the records from a CSV or JSON Lines file."""
+    _connect()
+
+    from chronos import importer
+
+    fmt = options.format
+    if fmt is None:
+        fmt = 'csv' if options.file.lower().endswith('.csv') else 'json'
+
+    started = time.time()
+    last_report = [started]
+
+    def progress(counts):
+        now = time.time()
+        if now - last_report[0] >= PROGRESS_INTERVAL:
+            last_report[0] = now
+            log.info("Imported %d of %d records read (%d/s)",
+                     counts['inserted'], counts['read'],
+                     counts['read'] / (now - started))
+
+    if options.file == '-':
+        f = sys.stdin
+    else:
+        f = open(options.file, 'rb')
+
+    with f:
+        job = importer.Import(importer.FORMATS[fmt](f))
+        counts = job.run(batch_size=options.batch_size, progress=progress)
+
+    log.info("Imported %d records and %d projects in %.1f s, skipped %d "
+             "duplicates and %d invalid rows", counts['inserted'],
+             counts['projects'], time.time() - started, counts['duplicates'],
+             counts['invalid'])
+    startup.mark('import')
+
+
+def export_records(options):
+    """Write the raw records for a range of dates as CSV or JSON Lines."""
+    _connect()
+
+    from chronos import export, utils
+
+    start = utils.start_of_day(options.from_) if options.from_ else None
+    stop = utils.end_of_day(options.to) if options.to else None
+
+    if options.output is None:
+        out = sys.stdout
+    else:
+        out = open(options.output, 'wb')
+
+    try:
+        count = export.export(out, options.format, start, stop,
+                              options.filter)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    log.info("Exported %d records", count)
+    startup.mark('export')
+
+
+def parse_args(argv):
+    """Parse the command line arguments.
+
+    Without a command, the graphical user interface is started.
+    """
 
     parser = argparse.ArgumentParser()
     parser.add_argument('-l',
@@ -38,18 +184,122 @@ def main():
                         '--config',
                         help='Config file',
                         default='~/.chronos/config.yml')
+    parser.add_argument('--instrument',
+                        help='Record the call counts and latencies of the '
+                        'services and widgets',
+                        action='store_true')
+    parser.add_argument('--instrument-output',
+                        help='Write the recorded latencies as JSON to this '
+                        'file on exit, implies --instrument')
+    parser.add_argument('--startup-time',
+                        help='Print the time spent in each phase of startup',
+                        action='store_true')
+
+    commands = parser.add_subparsers(dest='command')
+
+    gui_parser = commands.add_parser('gui',
+                                     help='Start the time clock (default)')
+    gui_parser.set_defaults(func=gui)
+
+    today = datetime.today()
+    report_parser = commands.add_parser('report',
+                                        help='Print a report to stdout')
+    report_parser.add_argument('--from',
+                               dest='from_',
+                               help='First day, YYYY-MM-DD (default today)',
+                               type=_date,
+                               default=today)
+    report_parser.add_argument('--to',
+                               help='Last day, YYYY-MM-DD (default today)',
+                               type=_date,
+                               default=today)
+    report_parser.add_argument('--summary',
+                               help='Report the total time per project',
+                               action='store_true')
+    report_parser.add_argument('--filter',
+                               help='Project filter, using * for wildcards')
+    report_parser.add_argument('--format',
+                               help='Output format, json is JSON Lines',
+                               default='text',
+                               choices=REPORT_FORMATS)
+    report_parser.set_defaults(func=print_report)
+
+    import_parser = commands.add_parser('import',
+                                        help='Import records from a file')
+    import_parser.add_argument('file',
+                               help='CSV or JSON Lines file, - for stdin')
+    import_parser.add_argument('--format',
+                               help='Input format, json is JSON Lines '
+                               '(default from the file extension)',
+                               choices=IMPORT_FORMATS)
+    import_parser.add_argument('--batch-size',
+                               help='Number of records per transaction',
+                               type=int)
+    import_parser.set_defaults(func=import_records)
+
+    export_parser = commands.add_parser('export',
+                                        help='Export the raw records')
+    export_parser.add_argument('--from',
+                               dest='from_',
+                               help='First day, YYYY-MM-DD (default first '
+                               'record)',
+                               type=_date)
+    export_parser.add_argument('--to',
+                               help='Last day, YYYY-MM-DD (default last '
+                               'record)',
+                               type=_date)
+    export_parser.add_argument('--filter',
+                               help='Project filter, using * for wildcards')
+    export_parser.add_argument('--format',
+                               help='Output format, json is JSON Lines',
+                               default='csv',
+                               choices=IMPORT_FORMATS)
+    export_parser.add_argument('-o',
+                               '--output',
+                               help='Output file (default stdout)')
+    export_parser.set_defaults(func=export_records)
+
+    rebuild_parser = commands.add_parser('rebuild-rollups',
+                                         help='Regenerate the daily rollups')
+    rebuild_parser.set_defaults(func=rebuild_rollups)
+
+    if not any(arg in COMMANDS for arg in argv):
+        argv = list(argv) + ['gui']
+
+    return parser.parse_args(argv)
+
+
+def main():
+    """"Main entrypoint."""
+
+    options = parse_args(sys.argv[1:])
+    if options.startup_time:
+        startup.enable()
+    startup.mark('import main')
+
+    # Instrumentation has to be enabled before the instrumented modules are
+    # imported.
+    if options.instrument or options.instrument_output:
+        instrument.enable()
+    if options.instrument_output:
+        atexit.register(_dump_instrumentation, options.instrument_output)
 
-    options = parser.parse_args()
     chronos.logging.init(level=_log_level(options.loglevel))
 
     import os
     log.error("Path is %s", os.path.dirname(os.path.realpath(__file__)))
 
+    from chronos import config
+    startup.mark('import config (yaml)')
+
     config.load(options.config)
-    connect()
+    startup.mark('load config')
 
-    app = Application()
-    app.run()
+    options.func(options)
+
+    # The GUI reports once its initial load has completed.
+    if options.command != 'gui':
+        startup.report()
 
 # ----------------------------------------------------------------------------
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Versioned database schema, managed by alembic."""
+
+from __future__ import absolute_import
+
+import logging
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.migration import MigrationContext
+
+log = logging.getLogger(__name__)
+
+SCRIPT_LOCATION = os.path.dirname(os.path.abspath(__file__))
+
+
+def _config(connection):
+    """Build an alembic configuration bound to the given connection."""
+    cfg = Config()
+    cfg.set_main_option('script_location', SCRIPT_LOCATION)
+    cfg.attributes['connection'] = connection
+    return cfg
+
+
+def current(connection):
+    """Return the revision the database is currently at, or `None`."""
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def upgrade(connection, revision='head'):
+    """Upgrade the database schema to the given revision.
+
+    Databases created by older versions of chronos, before the schema was
+    versioned, are adopted by the initial revision.
+
+    :param connection: An open SQLAlchemy connection.
+    :param str revision: The target revision, defaults to the latest.
+    """
+    # Alembic logs each step at INFO, on every connect.
+    alembic_log = logging.getLogger('alembic')
+    level = alembic_log.level
+    alembic_log.setLevel(logging.WARNING)
+    try:
+        log.debug("Database schema at revision %s", current(connection))
+        command.upgrade(_config(connection), revision)
+        log.debug("Database schema upgraded to revision %s",
+                  current(connection))
+    finally:
+        alembic_log.setLevel(level)
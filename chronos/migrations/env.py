@@ -0,0 +1,31 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Alembic environment for the chronos schema."""
+
+from __future__ import absolute_import
+
+from alembic import context
+
+
+def run_migrations_offline():
+    """Emit the migration SQL to the script output."""
+    context.configure(url=context.config.get_main_option('sqlalchemy.url'),
+                      literal_binds=True)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run the migrations against the connection supplied by the caller."""
+    connection = context.config.attributes['connection']
+    context.configure(connection=connection)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,71 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Initial schema with indexes on the record table.
+
+Earlier versions let `dataset` create the tables on the fly, so an existing
+database may already contain some or all of these tables and columns.  Only
+what is missing is created.
+
+Revision ID: 0001
+Revises:
+Create Date: 2017-08-01 00:00:00
+"""
+
+from __future__ import absolute_import
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TABLES = {
+    'project': [
+        ('name', sa.UnicodeText),
+    ],
+    'record': [
+        ('project', sa.UnicodeText),
+        ('start', sa.Integer),
+        ('elapsed', sa.Integer),
+    ],
+}
+
+
+def _ensure_table(inspector, name, columns):
+    """Create the table, or add any columns missing from an existing one."""
+    if name not in inspector.get_table_names():
+        op.create_table(name, sa.Column('id', sa.Integer, primary_key=True),
+                        *[sa.Column(c, t) for c, t in columns])
+        return
+
+    existing = set(c['name'] for c in inspector.get_columns(name))
+    for column, type_ in columns:
+        if column not in existing:
+            op.add_column(name, sa.Column(column, type_))
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, columns in sorted(TABLES.items()):
+        _ensure_table(inspector, name, columns)
+
+    # Range queries by start time, e.g. `RecordService.by_day`.  Including
+    # `elapsed` lets summaries be answered from the index alone.
+    op.create_index('ix_record_start_elapsed', 'record', ['start', 'elapsed'])
+
+    # Filtered range queries and updates keyed on (project, start).
+    op.create_index('ix_record_project_start', 'record', ['project', 'start'])
+
+    # Lookup of the ongoing record, which is the only one with no elapsed
+    # time.
+    op.create_index('ix_record_ongoing', 'record', ['start'],
+                    sqlite_where=sa.text('elapsed = 0'),
+                    postgresql_where=sa.text('elapsed = 0'))
+
+
+def downgrade():
+    op.drop_index('ix_record_ongoing', 'record')
+    op.drop_index('ix_record_project_start', 'record')
+    op.drop_index('ix_record_start_elapsed', 'record')
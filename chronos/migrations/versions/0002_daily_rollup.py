@@ -0,0 +1,40 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Per-day, per-project rollup of the elapsed time of stopped records.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2017-08-02 00:00:00
+"""
+
+from __future__ import absolute_import
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rollup',
+                    sa.Column('id', sa.Integer, primary_key=True),
+                    sa.Column('day', sa.String(10), nullable=False),
+                    sa.Column('project', sa.UnicodeText),
+                    sa.Column('elapsed', sa.Integer, nullable=False))
+    op.create_index('ix_rollup_day_project', 'rollup', ['day', 'project'],
+                    unique=True)
+
+    # Seed the rollup from the existing records, the day is the local date
+    # on which the record was started.
+    op.execute("INSERT INTO rollup (day, project, elapsed) "
+               "SELECT date(start, 'unixepoch', 'localtime'), project, "
+               "SUM(elapsed) FROM record WHERE elapsed > 0 "
+               "GROUP BY 1, 2")
+
+
+def downgrade():
+    op.drop_index('ix_rollup_day_project', 'rollup')
+    op.drop_table('rollup')
@@ -0,0 +1,108 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Reference projects by id from the record and rollup tables.
+
+Records and rollups used to store the project name.  Any project only
+named by records is created, projects with the same name are merged, and
+the names are replaced by a foreign key into the project table.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2017-08-03 00:00:00
+"""
+
+from __future__ import absolute_import
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def _drop_record_indexes():
+    """Drop the indexes on the record table, before it is recreated.
+
+    Batch mode would otherwise recreate the partial index as a full one.
+    """
+    op.drop_index('ix_record_ongoing', 'record')
+    op.drop_index('ix_record_start_elapsed', 'record')
+
+
+def _create_record_indexes():
+    op.create_index('ix_record_start_elapsed', 'record', ['start', 'elapsed'])
+    op.create_index('ix_record_ongoing', 'record', ['start'],
+                    sqlite_where=sa.text('elapsed = 0'),
+                    postgresql_where=sa.text('elapsed = 0'))
+
+
+def upgrade():
+    op.execute("INSERT INTO project (name) "
+               "SELECT DISTINCT project FROM record "
+               "WHERE project IS NOT NULL AND project NOT IN "
+               "(SELECT name FROM project WHERE name IS NOT NULL)")
+    op.execute("DELETE FROM project WHERE id NOT IN "
+               "(SELECT MIN(id) FROM project GROUP BY name)")
+    op.create_index('ix_project_name', 'project', ['name'], unique=True)
+
+    op.add_column('record', sa.Column('project_id', sa.Integer))
+    op.execute("UPDATE record SET project_id = "
+               "(SELECT id FROM project WHERE project.name = record.project)")
+
+    _drop_record_indexes()
+    op.drop_index('ix_record_project_start', 'record')
+    with op.batch_alter_table('record') as batch:
+        batch.drop_column('project')
+        batch.create_foreign_key('fk_record_project_id', 'project',
+                                 ['project_id'], ['id'])
+    _create_record_indexes()
+    op.create_index('ix_record_project_id_start', 'record',
+                    ['project_id', 'start'])
+
+    op.drop_index('ix_rollup_day_project', 'rollup')
+    op.drop_table('rollup')
+    op.create_table('rollup',
+                    sa.Column('id', sa.Integer, primary_key=True),
+                    sa.Column('day', sa.String(10), nullable=False),
+                    sa.Column('project_id', sa.Integer,
+                              sa.ForeignKey('project.id')),
+                    sa.Column('elapsed', sa.Integer, nullable=False))
+    op.create_index('ix_rollup_day_project_id', 'rollup',
+                    ['day', 'project_id'], unique=True)
+    op.execute("INSERT INTO rollup (day, project_id, elapsed) "
+               "SELECT date(start, 'unixepoch', 'localtime'), project_id, "
+               "SUM(elapsed) FROM record WHERE elapsed > 0 "
+               "GROUP BY 1, 2")
+
+
+def downgrade():
+    op.add_column('record', sa.Column('project', sa.UnicodeText))
+    op.execute("UPDATE record SET project = "
+               "(SELECT name FROM project "
+               "WHERE project.id = record.project_id)")
+
+    _drop_record_indexes()
+    op.drop_index('ix_record_project_id_start', 'record')
+    with op.batch_alter_table('record') as batch:
+        batch.drop_constraint('fk_record_project_id', type_='foreignkey')
+        batch.drop_column('project_id')
+    _create_record_indexes()
+    op.create_index('ix_record_project_start', 'record', ['project', 'start'])
+
+    op.drop_index('ix_rollup_day_project_id', 'rollup')
+    op.drop_table('rollup')
+    op.create_table('rollup',
+                    sa.Column('id', sa.Integer, primary_key=True),
+                    sa.Column('day', sa.String(10), nullable=False),
+                    sa.Column('project', sa.UnicodeText),
+                    sa.Column('elapsed', sa.Integer, nullable=False))
+    op.create_index('ix_rollup_day_project', 'rollup', ['day', 'project'],
+                    unique=True)
+    op.execute("INSERT INTO rollup (day, project, elapsed) "
+               "SELECT date(start, 'unixepoch', 'localtime'), project, "
+               "SUM(elapsed) FROM record WHERE elapsed > 0 "
+               "GROUP BY 1, 2")
+
+    op.drop_index('ix_project_name', 'project')
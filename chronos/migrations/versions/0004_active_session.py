@@ -0,0 +1,41 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Track the ongoing record in a dedicated session table.
+
+The session table holds the id of the record which is currently running,
+so that it can be found without searching the record table.  It is seeded
+with the last started ongoing record.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2017-08-04 00:00:00
+"""
+
+from __future__ import absolute_import
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('session',
+                    sa.Column('id', sa.Integer, primary_key=True),
+                    sa.Column('record_id', sa.Integer,
+                              sa.ForeignKey('record.id'),
+                              nullable=False))
+    op.create_index('ix_session_record_id', 'session', ['record_id'],
+                    unique=True)
+
+    op.execute("INSERT INTO session (record_id) "
+               "SELECT id FROM record WHERE elapsed = 0 "
+               "ORDER BY start DESC LIMIT 1")
+
+
+def downgrade():
+    op.drop_index('ix_session_record_id', 'session')
+    op.drop_table('session')
@@ -0,0 +1,441 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Timesheet reports, independent of the user interface."""
+
+from __future__ import absolute_import
+
+import collections
+import copy
+import csv
+import json
+import logging
+import time
+
+from chronos import utils
+
+log = logging.getLogger(__name__)
+
+
+def like_pattern(filter_):
+    """Convert a project filter using * for wildcards to a `LIKE` pattern.
+
+    :param str filter_: The filter as entered by the user.
+    :return str: The pattern, or `None` if the filter is empty.
+    """
+    if not filter_:
+        return None
+
+    filter_ = filter_.replace("%", "\\%")
+    filter_ = filter_.replace("*", "%")
+    return filter_
+
+
+def _any_project(name):
+    """Match any project name, when there is no filter."""
+    return True
+
+
+def refines(pattern, previous):
+    """Return true if a pattern only matches names the previous one does.
+
+    Patterns match on a prefix, so extending a pattern narrows it, unless
+    the previous one ends with an escape character.
+
+    :param str pattern: The new `LIKE` pattern, or `None`.
+    :param str previous: The previous `LIKE` pattern, or `None`.
+    """
+    if not previous:
+        return True
+    if not pattern or previous.endswith('\\'):
+        return False
+    return pattern.startswith(previous)
+
+
+class ReportModel(object):
+    """The contents of a report, computed in a single pass.
+
+    The ledger rows are (project, date, start, stop, elapsed) tuples, where
+    the date and times are local, `stop` is `None` for ongoing records, and
+    `elapsed` is in seconds.  The totals are (project, elapsed) tuples in
+    order of project.  Ongoing records are counted up until `now`.
+    """
+
+    def __init__(self, now, totals=()):
+        """Initialize the model with the totals only.
+
+        :param int now: The epoch seconds (UTC) the report was loaded at.
+        :param list totals: The (project, elapsed) tuples.
+        """
+        self.now = now
+
+        # The ledger rows, or `None` if only the totals were loaded.
+        self.ledger = None
+        self.totals = list(totals)
+        self.total = sum(elapsed for _, elapsed in self.totals)
+
+    @classmethod
+    def from_totals(cls, totals, now):
+        """Build the model from the totals aggregated by the database.
+
+        :param list<dict> totals: As returned by `RecordService.totals()`.
+        :param int now: The time the ongoing records were counted up to.
+        """
+        return cls(now, [(entry['project'], entry['elapsed'])
+                         for entry in totals])
+
+    @classmethod
+    def from_records(cls, records, now, stream=False):
+        """Build the model from the records, totalling them as they go.
+
+        :param iterable<Record> records: The records, in order of start.
+        :param int now: The time to count the ongoing records up to.
+        :param bool stream: Convert the records while the ledger is read,
+                            the totals are only complete once it has been.
+        """
+        model = cls(now)
+        model.ledger = model._convert(records)
+        if not stream:
+            model.ledger = list(model.ledger)
+        return model
+
+    def _convert(self, records):
+        """Generate the ledger rows, adding up the totals."""
+        converter = utils.LocalTimeConverter()
+        totals = collections.defaultdict(int)
+        now = self.now
+
+        for record in records:
+            if record.elapsed:
+                stop = converter.time(record.stop)
+                elapsed = record.elapsed
+            else:
+                stop = None
+                elapsed = now - record.start
+
+            totals[record.project] += elapsed
+            self.total += elapsed
+            yield (record.project, converter.date(record.start),
+                   converter.time(record.start), stop, elapsed)
+
+        self.totals = sorted(totals.iteritems())
+
+    def narrow(self, matches):
+        """Return a model with only the rows of the projects matching.
+
+        :param callable matches: Tests the name of a project.
+        """
+        model = ReportModel(self.now, [entry for entry in self.totals
+                                       if matches(entry[0])])
+        if self.ledger is not None:
+            model.ledger = [row for row in self.ledger if matches(row[0])]
+        return model
+
+
+class Timesheet(object):
+    """The time spent on projects within a range of dates.
+
+    In summary mode there is one row per project with its total time,
+    otherwise there is one row per record (a "punch of the timeclock").
+    The mode may be changed once loaded, if the contents needed for it
+    are `available()`.
+    """
+
+    fmt_summary = "  %-30s %-10s"
+    fmt_ledger = "  %-30s %-6s %-10s %-10s %-10s"
+
+    def __init__(self,
+                 start,
+                 stop,
+                 filter_=None,
+                 summary=True,
+                 use_rollups=False,
+                 record_service=None):
+        """Describe the report, nothing is loaded until `load()`.
+
+        :param datetime start: The first second of the report (local).
+        :param datetime stop: The last second of the report (local).
+        :param str filter_: filter string for projects, using * wildcards.
+        :param bool summary: Whether to report the totals per project.
+        :param bool use_rollups: Whether to read the summary from the daily
+                                 rollups rather than the raw records.
+        :param RecordService record_service: The service to query.
+        """
+        self.start = start
+        self.stop = stop
+        self.filter_ = like_pattern(filter_)
+        self.summary = summary
+        self.use_rollups = use_rollups
+        self._record_service = record_service
+
+        self.model = None
+
+        # Whether the contents were loaded, and can be narrowed.
+        self.loaded = False
+
+    @property
+    def record_service(self):
+        """The service queried, a `RecordService` unless one was given.
+
+        The database layer is only imported once the report is loaded, so
+        that describing a report does not import it.
+        """
+        if self._record_service is None:
+            from chronos.db import RecordService
+            self._record_service = RecordService()
+        return self._record_service
+
+    @property
+    def now(self):
+        """The time the ongoing records are counted up to, once loaded."""
+        return self.model.now if self.model is not None else None
+
+    @property
+    def total(self):
+        """The grand total, complete once all the rows are generated."""
+        return self.model.total if self.model is not None else 0
+
+    def load(self, stream=False):
+        """Query the database for the contents of the report.
+
+        In summary mode only the totals are loaded, while the ledger also
+        holds the totals, so it may be shown in either mode.
+
+        :param bool stream: Stream the records of a ledger from the database
+                            while the rows are generated, rather than
+                            loading them all up front.
+        """
+        now = int(time.time())
+        query = dict(start_date=self.start,
+                     stop_date=self.stop,
+                     filter_=self.filter_)
+
+        if self.summary:
+            if self.use_rollups:
+                summarize = self.record_service.rollup_totals
+            else:
+                summarize = self.record_service.totals
+            self.model = ReportModel.from_totals(
+                summarize(now=now, **query), now)
+        else:
+            if stream:
+                records = self.record_service.iter_records(**query)
+            else:
+                records = self.record_service.records(**query)
+            self.model = ReportModel.from_records(records, now, stream)
+
+        # Streamed records can only be read once.
+        self.loaded = not stream
+
+    def in_mode(self, summary):
+        """Return the report in a mode, sharing the contents loaded.
+
+        :param bool summary: The mode, which should be `available()`.
+        """
+        other = copy.copy(self)
+        other.summary = summary
+        return other
+
+    def available(self, summary):
+        """Return true if the report can be shown in a mode without loading.
+
+        :param bool summary: The mode, see `Timesheet.summary`.
+        """
+        return self.loaded and (summary or self.model.ledger is not None)
+
+    def refines(self, other):
+        """Return true if the contents can be narrowed from another report.
+
+        :param Timesheet other: A report with a less specific filter, but
+                                otherwise the same as this one.
+        """
+        return (other.available(self.summary) and
+                (other.start, other.stop, other.use_rollups) ==
+                (self.start, self.stop, self.use_rollups) and
+                refines(self.filter_, other.filter_))
+
+    def narrow(self, other):
+        """Load the contents from another report, rather than the database.
+
+        The rows of the projects not matching the filter are dropped.
+
+        :param Timesheet other: A report which this one `refines()`.
+        """
+        if self.filter_:
+            from chronos.db import ProjectIndex
+            matches = ProjectIndex.matcher(self.filter_)
+        else:
+            matches = _any_project
+
+        self.model = other.model.narrow(matches)
+        self.loaded = True
+
+    def rows(self):
+        """Generate the rows of the report.
+
+        Each row is a tuple of (project, date, start, stop, elapsed), as in
+        the ledger of the `ReportModel`, with only the project and elapsed
+        time set in summary mode.
+        """
+        if self.summary:
+            for project, elapsed in self.model.totals:
+                yield project, None, None, None, elapsed
+        else:
+            for row in self.model.ledger:
+                yield row
+
+    def _date_header(self):
+        """Generate the lines for the date header."""
+        min_day = self.start.date()
+        max_day = self.stop.date()
+
+        # Depending on if the report covers a single day or a range of dates
+        # construct the date header line accordingly.
+        if min_day == max_day:
+            yield min_day.strftime("%A, %B %d, %Y")
+        else:
+            yield "%s - %s" % (min_day.isoformat(), max_day.isoformat())
+
+    def _column_headings(self):
+        """Generate the column headings depending on the mode."""
+        if self.summary:
+            yield self.fmt_summary % ("PROJECT", "TIME")
+            yield self.fmt_summary % ("-------", "-----")
+        else:
+            yield self.fmt_ledger % ("PROJECT", "DATE", "START", "STOP",
+                                     "TIME")
+            yield self.fmt_ledger % ("-------", "----", "-----", "----",
+                                     "----")
+
+    def _footer(self):
+        """Generate the footer lines based on the mode."""
+        if self.summary:
+            yield self.fmt_summary % ('=====', '=====')
+            yield self.fmt_summary % ('TOTAL', utils.human_time(self.total))
+        else:
+            yield self.fmt_ledger % ('=====', '', '', '', '=====')
+            yield self.fmt_ledger % ('TOTAL', '', '', '',
+                                     utils.human_time(self.total, 0))
+
+    def _shown(self, elapsed):
+        """Return true if a row is shown, i.e. its time isn't 00:00."""
+        if self.summary:
+            return utils.human_time(elapsed) != "00:00"
+
+        # Without rounding, that is any time under a minute.
+        return not 0 <= elapsed < 60
+
+    def _format(self, row):
+        """Format a row as a line of text."""
+        project, day, start, stop, elapsed = row
+        if self.summary:
+            return self.fmt_summary % (project, utils.human_time(elapsed))
+        return self.fmt_ledger % (project, day.strftime('%m-%d'),
+                                  start.isoformat(),
+                                  stop.isoformat() if stop else '-',
+                                  utils.human_time(elapsed, 0))
+
+    def lines(self):
+        """Generate the report contents as text."""
+
+        for line in self._date_header():
+            yield line
+
+        for line in self._column_headings():
+            yield line
+
+        for row in self.rows():
+            if self._shown(row[4]):
+                yield self._format(row)
+
+        for line in self._footer():
+            yield line
+
+    def view(self):
+        """Return the lines of the loaded report, see `ReportLines`."""
+        return ReportLines(self)
+
+    def records_as_dicts(self):
+        """Generate the rows as dicts, with dates and times in ISO format."""
+        for project, day, start, stop, elapsed in self.rows():
+            if self.summary:
+                yield {'project': project, 'elapsed': elapsed}
+            else:
+                yield {
+                    'project': project,
+                    'date': day.isoformat(),
+                    'start': start.isoformat(),
+                    'stop': stop.isoformat() if stop else None,
+                    'elapsed': elapsed,
+                }
+
+
+class ReportLines(object):
+    """The lines of a loaded report, as a sequence formatted when read.
+
+    Only the header, the footer and the selection of the rows shown are
+    computed up front, so that a view of a long report only pays for
+    formatting the lines it displays.
+    """
+
+    def __init__(self, timesheet):
+        """Index the lines of the report.
+
+        :param Timesheet timesheet: A report loaded without streaming.
+        """
+        self.timesheet = timesheet
+        self.head = (list(timesheet._date_header()) +
+                     list(timesheet._column_headings()))
+        self.rows = [row for row in timesheet.rows()
+                     if timesheet._shown(row[4])]
+        self.foot = list(timesheet._footer())
+
+    def __len__(self):
+        return len(self.head) + len(self.rows) + len(self.foot)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        if index < len(self.head):
+            return self.head[index]
+        index -= len(self.head)
+        if index < len(self.rows):
+            return self.timesheet._format(self.rows[index])
+        return self.foot[index - len(self.rows)]
+
+
+def write_text(timesheet, out):
+    """Write the report as formatted text."""
+    for line in timesheet.lines():
+        out.write(utils.encode(line) + "\n")
+
+
+def write_csv(timesheet, out):
+    """Write the report as CSV with a header row."""
+    if timesheet.summary:
+        fields = ['project', 'elapsed']
+    else:
+        fields = ['project', 'date', 'start', 'stop', 'elapsed']
+
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    for row in timesheet.records_as_dicts():
+        writer.writerow([utils.encode(row[field]) for field in fields])
+
+
+def write_json(timesheet, out):
+    """Write the report as JSON Lines, with one object per row."""
+    for row in timesheet.records_as_dicts():
+        out.write(json.dumps(row, sort_keys=True) + "\n")
+
+
+FORMATS = {
+    'text': write_text,
+    'csv': write_csv,
+    'json': write_json,
+}
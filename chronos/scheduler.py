@@ -0,0 +1,125 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Central scheduler for the periodic refresh of the UI widgets."""
+
+from __future__ import absolute_import
+
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class _Job(object):
+    """A periodic callback belonging to a widget."""
+
+    def __init__(self, widget, callback, interval_ms):
+        self.widget = widget
+        self.callback = callback
+        self.interval_ms = interval_ms
+
+        # The time in milliseconds when the job is next due to run.
+        self.due = 0
+
+    def interval(self):
+        """Return the current interval in milliseconds."""
+        if callable(self.interval_ms):
+            return self.interval_ms()
+        return self.interval_ms
+
+
+class Scheduler(object):
+    """Drive the periodic callbacks of all widgets from a single timer.
+
+    Jobs only run while their widget is visible, so the tabs which are not
+    selected in a notebook are not refreshed.  A job which fell due while
+    hidden runs as soon as its widget is shown again.  Everything is paused
+    while the window is minimized.
+    """
+
+    def __init__(self, window):
+        """Initialize the scheduler for the given top level window."""
+        self.window = window
+        self.jobs = []
+        self.running = False
+        self._after_id = None
+
+        self.window.bind('<Map>', self._on_map, add='+')
+
+    def register(self, widget, callback, interval_ms):
+        """Run the callback periodically while the widget is visible.
+
+        :param widget: The Tk widget the callback refreshes.
+        :param callable callback: The function to run.
+        :param interval_ms: The interval in milliseconds, or a callable
+                            returning it, to allow for adaptive intervals.
+        """
+        self.jobs.append(_Job(widget, callback, interval_ms))
+        self.reschedule()
+
+    def start(self):
+        """Start running the jobs of the visible widgets."""
+        self.running = True
+        self.reschedule(0)
+
+    def expire(self, widget):
+        """Make the jobs of the widget due immediately.
+
+        The jobs run straight away if the widget is visible, otherwise as
+        soon as it is shown.
+        """
+        for job in self.jobs:
+            if job.widget is widget:
+                job.due = 0
+        self.reschedule(0)
+
+    @property
+    def suspended(self):
+        """Return true if the window is minimized or withdrawn."""
+        return self.window.state() in ('iconic', 'withdrawn')
+
+    def _visible(self, job):
+        return bool(job.widget.winfo_viewable())
+
+    def _now(self):
+        return int(time.time() * 1000)
+
+    def tick(self):
+        """Run the due jobs of the visible widgets."""
+        if self.suspended:
+            self._cancel()
+            return
+
+        now = self._now()
+        for job in self.jobs:
+            if job.due <= now and self._visible(job):
+                try:
+                    job.callback()
+                except Exception:
+                    log.exception("Error running %r", job.callback)
+                job.due = now + job.interval()
+
+        self.reschedule()
+
+    def reschedule(self, delay=None):
+        """Wake up when the next job of a visible widget is due."""
+        self._cancel()
+        if not self.running:
+            return
+
+        if delay is None:
+            due = [job.due for job in self.jobs if self._visible(job)]
+            if not due:
+                return
+            delay = max(0, min(due) - self._now())
+
+        self._after_id = self.window.after(delay, self.tick)
+
+    def _cancel(self):
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _on_map(self, event):
+        """Catch up with the jobs when the window or a tab is shown."""
+        self.reschedule(0)
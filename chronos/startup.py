@@ -0,0 +1,44 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Measure the time spent in each phase of starting up."""
+
+from __future__ import absolute_import
+
+import sys
+import time
+
+enabled = False
+
+# The (phase, seconds) pairs recorded so far.
+phases = []
+
+_last = time.time()
+
+
+def enable():
+    """Start recording the phases."""
+    global enabled
+    enabled = True
+
+
+def mark(phase):
+    """Record the time spent since the previous mark as the given phase."""
+    global _last
+
+    if not enabled:
+        return
+
+    now = time.time()
+    phases.append((phase, now - _last))
+    _last = now
+
+
+def report(out=sys.stderr):
+    """Write the breakdown of the recorded phases."""
+    if not enabled:
+        return
+
+    for phase, seconds in phases:
+        out.write("%-40s %8.1f ms\n" % (phase, seconds * 1000))
+    total = sum(seconds for _, seconds in phases)
+    out.write("%-40s %8.1f ms\n" % ('total', total * 1000))
@@ -3,8 +3,11 @@
 """User Interface modules."""
 
 from chronos.ui.clock import Clock
+from chronos.ui.diagnostics import Diagnostics
+from chronos.ui.ledger import LedgerView
 from chronos.ui.log import Log
 from chronos.ui.project import Project
 from chronos.ui.reporting import CustomRange, Day, Month, Report, Week
 
-__all__ = [Clock, CustomRange, Day, Log, Month, Project, Report, Week]
+__all__ = [Clock, CustomRange, Day, Diagnostics, LedgerView, Log, Month,
+           Project, Report, Week]
@@ -10,8 +10,7 @@ import Tkinter as tk
 import ttk
 from datetime import datetime
 
-from chronos import event
-from chronos.db import ProjectService, RecordService
+from chronos import event, instrument, worker
 from chronos.utils import human_time
 
 log = logging.getLogger(__name__)
@@ -22,26 +21,45 @@ class Clock(ttk.Frame):
 
     POLLING_INTERVAL_MS = 1000
 
-    def __init__(self, master):
+    # While stopped, there is no elapsed time to keep up to date.
+    IDLE_POLLING_INTERVAL_MS = 60 * 1000
+
+    def __init__(self, master, scheduler):
         """Construct the frame and initialize the internal state."""
         ttk.Frame.__init__(self, master)
 
+        self.scheduler = scheduler
+
         self.project_list = set()
         self.active_project_start_ts = None
+        self.active_record_id = None
         self.clock_status = tk.StringVar()
         self.active_project = tk.StringVar()
         self.elapsed_time = tk.StringVar()
 
-        # TODO: Use dependency injection for these services.
-        self.project_service = ProjectService()
-        self.record_service = RecordService()
-
         self.configure_layout()
         self.create_widgets()
-        self.poll()
-        self.on_startup()
 
-        event.register(self.update)
+        scheduler.register(self, self.poll, self.polling_interval)
+
+        event.register(self.update, event.PROJECTS_CHANGED,
+                       event.RECORD_STARTED, event.RECORD_STOPPED)
+
+    # TODO: Use dependency injection for these services.  They are only used
+    # in jobs run by the worker, which imports the database layer after the
+    # window is shown.
+
+    @property
+    def project_service(self):
+        """The service for the project names."""
+        from chronos.db import ProjectService
+        return ProjectService()
+
+    @property
+    def record_service(self):
+        """The service for the time records."""
+        from chronos.db import RecordService
+        return RecordService()
 
     def configure_layout(self):
         for row in xrange(50):
@@ -97,11 +115,14 @@ class Clock(ttk.Frame):
         self.stop_button = ttk.Button(self, text='Stop', command=self.on_stop)
         self.stop_button.grid(row=50, column=18, columnspan=6, sticky='e')
 
-    @event.notify
     def on_startup(self):
         """Determine status of last exit and set the state accordingly."""
-        last_ongoing = self.record_service.ongoing()
+        worker.submit(lambda: self.record_service.ongoing(),
+                      callback=self.on_resume)
 
+    @event.notify(event.RECORD_STARTED)
+    def on_resume(self, last_ongoing):
+        """Resume the record which was ongoing at the last exit, if any."""
         if last_ongoing is not None:
             log.info("Resuming active project %s, started at %s",
                      last_ongoing['project'],
@@ -109,20 +130,27 @@ class Clock(ttk.Frame):
 
             self.active_project.set(last_ongoing['project'])
             self.active_project_start_ts = last_ongoing['start']
+            self.active_record_id = last_ongoing['id']
 
     def load(self):
-        """Load the project list from the database."""
-        self.project_list.clear()
+        """Load the project names from the database, on the worker."""
+        names = []
         for row in self.project_service.list():
             try:
-                self.project_list.add(row['name'])
+                names.append(row['name'])
             except KeyError:
                 log.debug("The database may not be ready.")
                 continue
+        return names
 
     def update(self):
         """Refresh the internal state of the object from the database."""
-        self.load()
+        worker.submit(self.load, callback=self.on_loaded, key=self)
+
+    def on_loaded(self, names):
+        """Refresh the widgets with the project names loaded."""
+        self.project_list.clear()
+        self.project_list.update(names)
 
         # Reset the list of projects displayed in the dropdown.
         self.box['values'] = sorted(self.project_list)
@@ -137,8 +165,10 @@ class Clock(ttk.Frame):
         if not self.active_project.get() and self.project_list:
             self.active_project.set([v for v in self.project_list][0])
 
-        # Toggle the enabled/disabled state of the buttons depending on if
-        # the clock is currently running.
+        self.refresh_buttons()
+
+    def refresh_buttons(self):
+        """Enable the buttons depending on whether the clock is running."""
         if self.running:
             self.start_button['state'] = tk.DISABLED
             self.stop_button['state'] = tk.NORMAL
@@ -148,6 +178,15 @@ class Clock(ttk.Frame):
             self.stop_button['state'] = tk.DISABLED
             self.box['state'] = tk.NORMAL
 
+        # The polling interval depends on whether the clock is running.
+        self.scheduler.expire(self)
+
+    def polling_interval(self):
+        """Only tick every second while the clock is running."""
+        if self.running:
+            return Clock.POLLING_INTERVAL_MS
+        return Clock.IDLE_POLLING_INTERVAL_MS
+
     def poll(self):
         """Update the displayed times so that the fields work in real-time."""
         if self.running:
@@ -158,15 +197,12 @@ class Clock(ttk.Frame):
             self.elapsed_time.set('')
             self.clock_status.set("Stopped")
 
-        self.after(Clock.POLLING_INTERVAL_MS, self.poll)
-
     @property
     def running(self):
         """Return true if an active project has been started."""
         return (self.active_project.get() and
                 self.active_project_start_ts is not None)
 
-    @event.notify
     def on_start(self):
         """Start the clock on the current active project."""
 
@@ -178,10 +214,23 @@ class Clock(ttk.Frame):
             log.debug("active project start timestamp %d",
                       self.active_project_start_ts)
 
-            self.record_service.start(project=self.active_project.get(),
-                                      ts=self.active_project_start_ts)
+            project = self.active_project.get()
+            ts = self.active_project_start_ts
+            worker.submit(
+                lambda: self.record_service.start(project=project, ts=ts),
+                callback=lambda record_id: self.on_started(record_id, ts))
+            self.refresh_buttons()
+
+    @event.notify(event.RECORD_STARTED)
+    def on_started(self, record_id, start_ts):
+        """Keep the id of the record started, to stop it later.
+
+        The id is ignored if the clock has been stopped, or started again,
+        since the record was started.
+        """
+        if start_ts == self.active_project_start_ts:
+            self.active_record_id = record_id
 
-    @event.notify
     def on_stop(self):
         """Stop the clock on the current active project."""
 
@@ -192,8 +241,22 @@ class Clock(ttk.Frame):
             stop_ts = int(time.time())
             log.debug("active project stop timestamp %d", stop_ts)
 
-            self.record_service.stop(project=self.active_project.get(),
-                                     start_ts=self.active_project_start_ts,
-                                     stop_ts=stop_ts, )
+            # Without the id, e.g. if the record is still being started, the
+            # active session is stopped.
+            record_id = self.active_record_id
+            worker.submit(
+                lambda: self.record_service.stop(stop_ts=stop_ts,
+                                                 record_id=record_id),
+                callback=self.on_stopped)
 
             self.active_project_start_ts = None
+            self.active_record_id = None
+            self.refresh_buttons()
+
+    @event.notify(event.RECORD_STOPPED)
+    def on_stopped(self, result):
+        """Refresh the widgets once the record has been stopped."""
+        pass
+
+
+instrument.methods(Clock, ['update', 'poll', 'on_loaded'])
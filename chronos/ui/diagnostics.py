@@ -0,0 +1,108 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""UI element for displaying the timing instrumentation."""
+
+from __future__ import absolute_import
+
+import logging
+import Tkinter as tk
+import tkFileDialog
+import ttk
+
+from chronos import instrument
+
+log = logging.getLogger(__name__)
+
+
+class Diagnostics(ttk.Frame):
+    """Widget for displaying the call counts and latencies."""
+
+    POLLING_INTERVAL_MS = 2 * 1000
+
+    fmt = "%-32s %8s %10s %8s %8s %8s %8s"
+
+    def __init__(self, master, scheduler):
+        """Construct the layout and initialize internal state."""
+        ttk.Frame.__init__(self, master)
+
+        self.configure_layout()
+        self.create_widgets()
+
+        # The lines currently displayed in the text box.
+        self.displayed = []
+
+        scheduler.register(self, self.poll, Diagnostics.POLLING_INTERVAL_MS)
+
+    def configure_layout(self):
+        """Configure the grid layout."""
+        for row in xrange(50):
+            self.rowconfigure(row, weight=1)
+
+        for col in xrange(12):
+            self.columnconfigure(col, weight=1)
+
+    def create_widgets(self):
+        """Layout the elements on screen."""
+
+        self.box = tk.Text(self)
+        self.box.grid(row=0,
+                      column=0,
+                      rowspan=48,
+                      columnspan=12,
+                      sticky='news')
+
+        self.reset_button = ttk.Button(self, text="Reset", command=self.reset)
+        self.reset_button.grid(row=49, column=10, sticky='news')
+
+        self.dump_button = ttk.Button(self, text="Dump", command=self.dump)
+        self.dump_button.grid(row=49, column=11, sticky='news')
+
+    def lines(self):
+        """Generate one line per instrumented function, slowest first."""
+        yield self.fmt % ("NAME", "CALLS", "TOTAL MS", "MEAN", "P50", "P90",
+                          "MAX")
+        yield self.fmt % ("----", "-----", "--------", "----", "---", "---",
+                          "---")
+
+        entries = sorted(instrument.stats.items(),
+                         key=lambda item: -item[1].total)
+        for name, stats in entries:
+            yield self.fmt % (name, stats.count, "%.1f" % stats.total,
+                              "%.1f" % stats.mean, stats.percentile(50),
+                              stats.percentile(90), "%.1f" % stats.max)
+
+    def update(self):
+        """Update the displayed contents of the window."""
+        lines = list(self.lines())
+        if lines == self.displayed:
+            return
+
+        self.box['state'] = tk.NORMAL
+        self.box.delete(1.0, tk.END)
+        self.box.insert(tk.END, "\n".join(lines))
+        self.box['state'] = tk.DISABLED
+        self.displayed = lines
+
+    def poll(self):
+        """Update the UI on each polling interval."""
+        self.update()
+
+    def reset(self):
+        """Forget the statistics recorded so far."""
+        instrument.reset()
+        self.update()
+
+    def dump(self):
+        """Save the statistics recorded so far as JSON."""
+        filename = tkFileDialog.asksaveasfilename(
+            defaultextension='.json',
+            initialfile='chronos-diagnostics.json')
+        if not filename:
+            return
+
+        with open(filename, 'w') as out:
+            instrument.dump(out)
+        log.info("Diagnostics saved to %s", filename)
+
+
+instrument.methods(Diagnostics, ['update', 'poll'])
@@ -0,0 +1,176 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Virtualized view of the lines of a report."""
+
+from __future__ import absolute_import
+
+import logging
+import Tkinter as tk
+import tkFont
+import ttk
+
+log = logging.getLogger(__name__)
+
+
+class LedgerView(ttk.Frame, object):
+    """A read-only view of a long list of lines.
+
+    The lines are a sequence, such as `ReportLines`, from which only those
+    in the viewport, along with a margin to scroll into, are read and
+    inserted in the Text widget.  The margin is moved along as the view is
+    scrolled, so the cost of showing and scrolling the lines does not
+    depend on how many there are.  The scrollbar is kept in step with the
+    position within all the lines.
+    """
+
+    # The number of lines inserted above and below those visible.
+    MARGIN = 50
+
+    def __init__(self, master):
+        """Create the text and scrollbar, with no lines."""
+        ttk.Frame.__init__(self, master)
+
+        self.lines = []
+
+        # The index of the first line inserted in the text widget, and the
+        # lines inserted.
+        self.first = 0
+        self.inserted = []
+
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.text = tk.Text(self,
+                            wrap=tk.NONE,
+                            state=tk.DISABLED,
+                            yscrollcommand=self.on_scrolled)
+        self.text.grid(row=0, column=0, sticky='news')
+
+        self.scrollbar = ttk.Scrollbar(self,
+                                       orient=tk.VERTICAL,
+                                       command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+
+        self.linespace = tkFont.Font(font=self.text['font']).metrics(
+            'linespace')
+
+        self.text.bind('<Configure>', self.on_configure)
+
+    @property
+    def visible(self):
+        """The number of lines which fit in the viewport."""
+        return max(1, self.text.winfo_height() // self.linespace)
+
+    @property
+    def top(self):
+        """The index of the first line in the viewport."""
+        row = int(self.text.index('@0,0').split('.')[0])
+        return min(self.first + row - 1, max(0, len(self.lines) - 1))
+
+    @property
+    def at_end(self):
+        """Return true if the last line is in the viewport."""
+        return self.top + self.visible >= len(self.lines)
+
+    def show(self, lines):
+        """Replace the lines shown.
+
+        The view stays at the end if it was there, e.g. to follow the
+        ongoing record, otherwise it stays at the same line.
+
+        :param lines: The sequence of lines, without line endings.
+        """
+        top = len(lines) if self.at_end else self.top
+        self.lines = lines
+        self.scroll_to(top, refresh=True)
+
+    def scroll_to(self, top, refresh=False):
+        """Scroll to show the lines from an index, as far as there are.
+
+        Only the lines in the viewport and the margin around it are kept in
+        the text widget, and they are only replaced once the viewport gets
+        close to the edge of the margin.
+
+        :param int top: The index of the line to show at the top.
+        :param bool refresh: Whether the lines may have changed.
+        """
+        visible = self.visible
+        top = max(0, min(top, len(self.lines) - visible))
+
+        if refresh or not self._covers(top):
+            self._insert(max(0, top - self.MARGIN),
+                         min(len(self.lines), top + visible + self.MARGIN))
+
+        # Text widget lines are numbered from 1.
+        self.text.yview('%d.0' % (top - self.first + 1))
+        self._set_scrollbar(top)
+
+    def _covers(self, top):
+        """Return true if enough lines around the viewport are inserted."""
+        lo = max(0, top - self.MARGIN // 2)
+        hi = min(len(self.lines), top + self.visible + self.MARGIN // 2)
+        return self.first <= lo and hi <= self.first + len(self.inserted)
+
+    def _insert(self, first, stop):
+        """Insert the lines in a range, replacing those inserted before.
+
+        Only the lines which changed are replaced, in a single Tcl call,
+        and nothing is redrawn if none did.
+        """
+        old = self.inserted
+        lines = self.lines[first:stop]
+        self.first = first
+        self.inserted = lines
+        if lines == old:
+            return
+
+        # Find the lines in common at the start and the end.
+        shortest = min(len(old), len(lines))
+        prefix = 0
+        while prefix < shortest and old[prefix] == lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < shortest - prefix and
+               old[-1 - suffix] == lines[-1 - suffix]):
+            suffix += 1
+
+        # Text widget lines are numbered from 1.
+        start = '%d.0' % (prefix + 1)
+        end = '%d.0' % (len(old) - suffix + 1)
+        chars = ''.join(line + "\n"
+                        for line in lines[prefix:len(lines) - suffix])
+
+        self.text['state'] = tk.NORMAL
+        self.text.tk.call(self.text._w, 'replace', start, end, chars)
+        self.text['state'] = tk.DISABLED
+
+    def _set_scrollbar(self, top):
+        total = len(self.lines)
+        if total:
+            self.scrollbar.set(float(top) / total,
+                               min(1.0, float(top + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """Scroll the view, as the command of the scrollbar."""
+        if args[0] == tk.MOVETO:
+            top = int(float(args[1]) * len(self.lines))
+        else:
+            amount = int(args[1])
+            if args[2] == tk.PAGES:
+                amount *= self.visible
+            top = self.top + amount
+        self.scroll_to(top)
+
+    def on_scrolled(self, *args):
+        """Follow the text widget when scrolled, e.g. by the mouse wheel."""
+        top = self.top
+        if not self._covers(top):
+            self.scroll_to(top)
+        else:
+            self._set_scrollbar(top)
+
+    def on_configure(self, event):
+        """Fill the viewport again once it is resized."""
+        self.scroll_to(len(self.lines) if self.at_end else self.top)
@@ -8,8 +8,8 @@ import logging
 import Tkinter as tk
 import ttk
 
-from chronos import event
-from chronos.logging import fetch
+from chronos import event, instrument
+from chronos.logging import MAX_LINES, fetch_since
 
 log = logging.getLogger(__name__)
 
@@ -19,20 +19,23 @@ class Log(ttk.Frame, object):
 
     POLLING_INTERVAL_MS = 3 * 1000
 
-    def __init__(self, master):
+    def __init__(self, master, scheduler):
         """Construct the layout and initialize internal state."""
         ttk.Frame.__init__(self, master)
 
-        self._text = ''
+        # The sequence number of the last log record displayed.
+        self.sequence = 0
 
         # Allow subclasses to override the polling interval.
         self.polling_interval_ms = Log.POLLING_INTERVAL_MS
 
         self.configure_layout()
         self.create_widgets()
-        self.poll()
 
-        event.register(self.update)
+        scheduler.register(self, self.poll, lambda: self.polling_interval_ms)
+
+        event.register(self.update, event.PROJECTS_CHANGED,
+                       event.RECORD_STARTED, event.RECORD_STOPPED)
 
     def configure_layout(self):
         """Configure the grid layout."""
@@ -52,24 +55,23 @@ class Log(ttk.Frame, object):
                       columnspan=24,
                       sticky='news')
 
-    @property
-    def text(self):
-        return self._text
-
-    @text.setter
-    def text(self, value):
-        """Set the text to be displayed in the window."""
-        self._text = str(value)
-
     def update(self):
-        """Update the displayed contents of the window."""
-        self.text = fetch()
+        """Append the records logged since the last update."""
+        records = fetch_since(self.sequence)
+        if not records:
+            return
+
+        self.sequence = records[-1][0]
+        text = ''.join(message + "\n" for _, message in records[-MAX_LINES:])
 
         self.box['state'] = tk.NORMAL
-        self.box.delete(1.0, tk.END)
+        self.box.insert(tk.END, text)
 
-        for line in self._text.splitlines():
-            self.box.insert(tk.END, line + "\n")
+        # Trim the oldest lines from the top, keeping the last `MAX_LINES`.
+        # The text always ends with an empty line after the final newline.
+        lines = int(self.box.index(tk.END).split('.')[0]) - 2
+        if lines > MAX_LINES:
+            self.box.delete(1.0, '%d.0' % (lines - MAX_LINES + 1))
 
         # Move the cursor to the end to prevent the display from jumping
         # back to the beginning after each refresh.
@@ -80,4 +82,6 @@ class Log(ttk.Frame, object):
     def poll(self):
         """Update the UI on each polling interval."""
         self.update()
-        self.after(self.polling_interval_ms, self.poll)
+
+
+instrument.methods(Log, ['update', 'poll'])
@@ -9,8 +9,7 @@ import Tkinter as tk
 import ttk
 import tkMessageBox
 
-from chronos import event
-from chronos.db import ProjectService
+from chronos import event, instrument, worker
 
 log = logging.getLogger(__name__)
 
@@ -22,7 +21,7 @@ class Project(ttk.Frame):
     # element.
     POLLING_INTERVAL = 250
 
-    def __init__(self, master):
+    def __init__(self, master, scheduler):
         """Initialize the layout and internal state."""
         ttk.Frame.__init__(self, master)
 
@@ -30,14 +29,23 @@ class Project(ttk.Frame):
         self.entry = tk.StringVar()
         self.selected = tk.StringVar()
 
-        self.project_service = ProjectService()
-
         self.configure_layout()
         self.create_widgets()
 
-        self.poll()
+        scheduler.register(self, self.poll, Project.POLLING_INTERVAL)
+
+        event.register(self.update, event.PROJECTS_CHANGED)
+        event.register(self.refresh_selection, event.SELECTION_CHANGED)
+
+    @property
+    def project_service(self):
+        """The service for the project names.
 
-        event.register(self.update)
+        It is only used in jobs run by the worker, which imports the database
+        layer after the window is shown.
+        """
+        from chronos.db import ProjectService
+        return ProjectService()
 
     def configure_layout(self):
         """Configure the grid layout."""
@@ -80,7 +88,6 @@ class Project(ttk.Frame):
         if self.entry.get():
             self.on_plus()
 
-    @event.notify
     def on_plus(self):
         """Add the entered text as a new project."""
 
@@ -91,12 +98,13 @@ class Project(ttk.Frame):
 
         if new_project not in self.project_list:
             log.info("Adding project %s", new_project)
-            self.project_service.create(name=new_project)
+            worker.submit(
+                lambda: self.project_service.create(name=new_project),
+                callback=self.on_changed)
             self.entry.set('')
         else:
             log.info("Project %s already exists", new_project)
 
-    @event.notify
     def on_minus(self):
         """Remove the currently selected project."""
 
@@ -104,7 +112,9 @@ class Project(ttk.Frame):
             # Prompt the user for confirmation before deleting a project.
             confirmed = tkMessageBox.askyesno(
                 "Delete project",
-                "Are you sure you want to delete %s?" % target)
+                "Are you sure you want to delete %s?\n\n"
+                "Only projects without any recorded time can be deleted, "
+                "so no time will be lost." % target)
             if not confirmed:
                 log.info("The delete operation for %s was cancelled by "
                          "the user.", target)
@@ -114,43 +124,73 @@ class Project(ttk.Frame):
         log.debug("attempt to remove project %s", target)
 
         if target in self.project_list and confirm_deletion(target):
-            try:
-                self.project_service.delete(name=target)
-            except KeyError as e:
-                log.warning("Failed to remove project %s: %s", target, e)
-                return
-            else:
+
+            def deleted(result):
                 log.info("Project %s successfully deleted.", target)
                 # Clear the entry box and save the status.
                 self.selected.set('')
-
-    @event.notify
+                self.on_changed()
+
+            def failed(error):
+                log.warning("Failed to remove project %s: %s", target, error)
+                if isinstance(error, ValueError):
+                    tkMessageBox.showwarning(
+                        "Delete project",
+                        "%s has recorded time, and can't be deleted." %
+                        target)
+
+            worker.submit(lambda: self.project_service.delete(name=target),
+                          callback=deleted,
+                          errback=failed)
+
+    @event.notify(event.PROJECTS_CHANGED)
+    def on_changed(self, result=None):
+        """Notify the other widgets once the projects have changed."""
+        pass
+
+    @event.notify(event.SELECTION_CHANGED)
     def on_selection(self, selection):
         """Update the current selection and save the status."""
         self.selected.set(selection)
 
     def load(self):
-        """Update the internal data from the database."""
+        """Load the project names from the database, on the worker."""
 
-        self.project_list.clear()
+        names = []
         for row in self.project_service.list():
             try:
-                self.project_list.add(row['name'])
+                names.append(row['name'])
             except KeyError:
                 log.debug("error fetching project, "
                           "database possibly not ready.")
+        return names
 
     def update(self):
         """Refresh the UI elements."""
-        self.load()
+        worker.submit(self.load, callback=self.on_loaded, key=self)
+
+    def on_loaded(self, names):
+        """Refresh the UI elements with the project names loaded."""
+        self.project_list.clear()
+        self.project_list.update(names)
 
         self.box.delete(0, tk.END)
         for project in sorted(self.project_list):
             self.box.insert(tk.END, project)
 
+        self.refresh_selection()
+
+    def refresh_selection(self):
+        """Highlight the selected project, and update the button state."""
         selection = self.selected.get()
+        names = self.box.get(0, tk.END)
+        if selection and selection not in names:
+            # The project was deleted since it was selected.
+            self.selected.set('')
+            selection = ''
+
         if selection:
-            idx = self.box.get(0, tk.END).index(selection)
+            idx = names.index(selection)
             self.box.activate(idx)
             self.box.selection_set(idx)
             self.minus_button['state'] = tk.NORMAL
@@ -169,4 +209,5 @@ class Project(ttk.Frame):
         else:
             self.plus_button['state'] = tk.DISABLED
 
-        self.after(Project.POLLING_INTERVAL, self.poll)
+
+instrument.methods(Project, ['update', 'poll', 'on_loaded'])
@@ -4,16 +4,15 @@
 
 from __future__ import absolute_import
 
-import collections
 import logging
-import time
 import Tkinter as tk
 import ttk
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
-from chronos import utils
-from chronos.db import RecordService
+from chronos import event, instrument, utils, worker
+from chronos.report import Timesheet
+from chronos.ui.ledger import LedgerView
 
 log = logging.getLogger(__name__)
 
@@ -23,15 +22,22 @@ class Report(ttk.Frame):
 
     POLLING_INTERVAL_MS = 30 * 1000
 
-    def __init__(self, master):
+    # The report is only refreshed once typing has paused for this long.
+    DEBOUNCE_MS = 300
+
+    def __init__(self, master, scheduler):
         """Initialilize the state of the report."""
 
         ttk.Frame.__init__(self, master)
 
+        self.scheduler = scheduler
+
         self.use_summary = tk.IntVar()
         self.filter_ = tk.StringVar()
+        self.status = tk.StringVar()
 
         self.text = ''
+        self._debounce_id = None
 
         # The reference date from which the report will be based.
         self.reference = datetime.today().date()
@@ -39,13 +45,15 @@ class Report(ttk.Frame):
         # By default, navigation buttons will move the reference date by 1 day.
         self.delta = relativedelta(days=1)
 
-        self.data = collections.defaultdict(list)
-        self.record_service = RecordService()
+        self.timesheet = None
 
         self.configure_layout()
         self.create_widgets()
 
-        self.poll()
+        scheduler.register(self, self.poll, self.POLLING_INTERVAL_MS)
+
+        event.register(self.on_changed, event.PROJECTS_CHANGED,
+                       event.RECORD_STARTED, event.RECORD_STOPPED)
 
     def configure_layout(self):
         """Configure the grid layout."""
@@ -58,12 +66,17 @@ class Report(ttk.Frame):
     def create_widgets(self):
         """Layout the elements on screen."""
 
+        ttk.Label(self, textvariable=self.status).grid(row=0,
+                                                       column=0,
+                                                       columnspan=4,
+                                                       sticky='w')
+
         ttk.Label(self, text="Filter").grid(row=0, column=9, sticky='e')
         filter_ = ttk.Entry(self, textvariable=self.filter_)
         filter_.grid(row=0, column=10, columnspan=2, sticky='news')
         self.filter_.trace("w", self.on_key)
 
-        self.box = tk.Text(self)
+        self.box = LedgerView(self)
         self.box.grid(row=1,
                       column=0,
                       rowspan=45,
@@ -76,7 +89,7 @@ class Report(ttk.Frame):
 
         self.summary_button.invoke()
         self.summary_button.grid(row=49, column=0, sticky='news')
-        self.use_summary.trace("w", self.on_key)
+        self.use_summary.trace("w", self.on_toggle)
 
         self.back_button = ttk.Button(self, text="<", command=self.back)
         self.back_button.grid(row=49, column=9, sticky='news')
@@ -102,51 +115,111 @@ class Report(ttk.Frame):
         self.reference += self.delta
         self.update()
 
-    def lines(self):
-        """Generate the lines to be displayed in the box."""
-        for line in self.text.splitlines():
-            yield line
-
-    def load(self):
-        """Subclasses should override this to load the data from the DB."""
-        pass
+    def query(self, refine=False):
+        """Return a function which loads the lines to be displayed.
 
-    def update(self):
-        """Update the displayed contents of the window."""
-        self.load()
+        This is called on the main thread, so it may read the state of the
+        widgets, while the function returned is run by the database worker
+        and must not touch Tk.  Subclasses should override this to load the
+        data from the DB.
 
-        self.box['state'] = tk.NORMAL
-        self.box.delete(1.0, tk.END)
+        :param bool refine: Whether the contents may be narrowed from those
+                            already loaded, if only the filter has changed.
+        """
+        text = self.text
+        return lambda: text.splitlines()
 
-        for line in self.lines():
-            self.box.insert(tk.END, line + "\n")
+    def valid(self):
+        """Return true if the report can be queried as entered."""
+        return True
 
-        # Move the cursor to the end to prevent the display from jumping
-        # back to the beginning after each refresh.
-        self.box.see(tk.END)
+    def update(self, refine=False):
+        """Request the contents of the window from the database worker.
 
-        self.box['state'] = tk.DISABLED
+        The lines displayed are kept, with a loading status, until the new
+        ones are ready.  A load still pending is superseded.
+        """
+        self.status.set("Loading...")
+        worker.submit(self.query(refine),
+                      callback=self.on_loaded,
+                      errback=self.on_error,
+                      key=self)
 
         if self.reference >= datetime.today().date():
             self.forward_button['state'] = tk.DISABLED
         else:
             self.forward_button['state'] = tk.NORMAL
 
+    def on_loaded(self, lines):
+        """Display the lines loaded by the database worker."""
+        self.status.set('')
+        self.render(lines)
+
+    def on_error(self, error):
+        """Show that the report could not be loaded."""
+        self.status.set("Error loading the report, see the log")
+
+    def render(self, lines):
+        """Display the lines.
+
+        Only the lines in view are formatted and inserted in the text box,
+        so that the cost does not depend on the length of the report.
+        """
+        self.box.show(lines)
+
     def on_key(self, *args):
+        """Refresh the report once typing has paused."""
+        if self._debounce_id is not None:
+            self.after_cancel(self._debounce_id)
+        self._debounce_id = self.after(self.DEBOUNCE_MS, self.on_typed)
+
+    def on_typed(self):
+        """Refresh the report with what was typed."""
+        self._debounce_id = None
+        self.refresh(refine=True)
+
+    def on_toggle(self, *args):
+        """Show the report in the mode selected.
+
+        The report already loaded is shown again if it holds the contents
+        for the mode, otherwise it is refreshed straight away.
+        """
+        summary = bool(self.use_summary.get())
+        timesheet = self.timesheet
+        if timesheet is None or not timesheet.available(summary):
+            self.refresh()
+            return
+
+        self.timesheet = timesheet.in_mode(summary)
+        worker.submit(self.timesheet.view,
+                      callback=self.on_loaded,
+                      errback=self.on_error,
+                      key=self)
+
+    def refresh(self, refine=False):
+        """Refresh the report, unless what was entered can't be queried."""
+        if not self.valid():
+            self.status.set("Enter dates as YYYY-MM-DD")
+            return
+
         self.text = str(self.reference)
-        self.update()
+        self.update(refine)
+
+    def on_changed(self):
+        """Refresh the report once it is visible."""
+        self.scheduler.expire(self)
 
     def poll(self):
-        """Repeatedly call the `self.poll()` method."""
-        self.on_key()
-        self.after(self.POLLING_INTERVAL_MS, self.poll)
+        """Refresh the report on each polling interval."""
+        self.refresh()
 
 
 class Day(Report):
     """Generate a report for a single day."""
 
-    fmt_summary = "  %-30s %-10s"
-    fmt_ledger = "  %-30s %-6s %-10s %-10s %-10s"
+    # Whether the summary is read from the daily rollups rather than
+    # aggregated from the raw records.
+    use_rollups = False
 
     def start(self):
         return utils.start_of_day(self.reference)
@@ -154,132 +227,49 @@ class Day(Report):
     def stop(self):
         return utils.end_of_day(self.reference)
 
-    def load(self):
-        """Refresh the internal data from the database."""
-
-        filter_ = self.filter_.get()
+    def query(self, refine=False):
+        """Return a function which loads the report from the database.
 
-        try:
-            if filter_:
-
-                # Use * for wildcards in syntax.
-                filter_ = filter_.replace("%", "\%")
-                filter_ = filter_.replace("*", "%")
+        In summary mode only the per-project totals are fetched, aggregated
+        by the database, otherwise the individual records are loaded.  When
+        refining, a filter which narrows the previous one is applied to the
+        report already loaded instead.
+        """
 
-                self.data = self.record_service.by_day(start_date=self.start(),
-                                                       stop_date=self.stop(),
-                                                       filter_=filter_)
-            else:
-                self.data = self.record_service.by_day(start_date=self.start(),
-                                                       stop_date=self.stop())
-        except ValueError:
-            self.data = {}
+        previous = self.timesheet
 
-    def _date_header(self):
-        """Generate the lines for the date header."""
         try:
-            min_day = self.start().date()
-            max_day = self.stop().date()
+            timesheet = Timesheet(self.start(),
+                                  self.stop(),
+                                  filter_=self.filter_.get(),
+                                  summary=bool(self.use_summary.get()),
+                                  use_rollups=self.use_rollups)
         except ValueError:
-            yield "No Data for %s" % str(self.reference)
-            return
-
-        # Depending on if the report covers a single day or a range of dates
-        # construct the date header line accordingly.
-        if min_day == max_day:
-            yield min_day.strftime("%A, %B %d, %Y")
-        else:
-            yield "%s - %s" % (min_day.isoformat(), max_day.isoformat())
-
-    def _column_headings(self):
-        """Generate the column headings depending on the mode."""
-        if self.use_summary.get():
-            yield self.fmt_summary % ("PROJECT", "TIME")
-            yield self.fmt_summary % ("-------", "-----")
-        else:
-            yield self.fmt_ledger % ("PROJECT", "DATE", "START", "STOP",
-                                     "TIME")
-            yield self.fmt_ledger % ("-------", "----", "-----", "----",
-                                     "----")
-
-    def _generate_timesheet(self):
-        """Generate the values to be displayed on the timesheet."""
-        if self.use_summary.get():
-            timesheet = collections.defaultdict(int)
-            # Since the data is stored as a list of entries per day, aggregate
-            # the total per-project time in a single timesheet.
-            for entries in self.data.values():
-                for entry in entries:
-                    if not entry['elapsed']:
-                        entry['elapsed'] = int(time.time()) - entry['start_ts']
-                    timesheet[entry['project']] += entry['elapsed']
-
-            for project, elapsed in sorted(timesheet.iteritems()):
-                yield project, None, None, None, elapsed
-
-        else:
-            # Calculate the time per "punch of the timeclock"
-            for entries in self.data.values():
-                for entry in entries:
-                    start_ts = utils.local_time(datetime.utcfromtimestamp(
-                        entry['start_ts']))
-                    start = start_ts.time().isoformat()
-                    if not entry['elapsed']:
-                        stop = '-'
-                    else:
-                        stop = utils.local_time(datetime.utcfromtimestamp(
-                            entry['stop_ts'])).time().isoformat()
-                    elapsed = (entry['elapsed'] or
-                               int(time.time()) - entry['start_ts'])
-                    yield (entry['project'], start_ts.date().strftime('%m-%d'),
-                           start, stop, elapsed)
-
-    def _footer(self):
-        """Generate the footer lines based on the mode."""
-        total = 0
-        for entries in self.data.values():
-            for entry in entries:
-                total += entry['elapsed'] or int(time.time()) - entry[
-                    'start_ts']
-
-        if self.use_summary.get():
-            yield self.fmt_summary % ('=====', '=====')
-            yield self.fmt_summary % ('TOTAL', utils.human_time(total))
-        else:
-            yield self.fmt_ledger % ('=====', '', '', '', '=====')
-            yield self.fmt_ledger % ('TOTAL', '', '', '',
-                                     utils.human_time(total, 0))
-
-    def lines(self):
-        """Generate the report contents."""
-
-        for line in self._date_header():
-            yield line
-
-        for line in self._column_headings():
-            yield line
-
-        for (project, start_date, start_time, stop,
-             elapsed) in self._generate_timesheet():
-            if self.use_summary.get():
-                display_time = utils.human_time(elapsed)
-                if display_time != "00:00":
-                    yield self.fmt_summary % (project, display_time)
+            self.timesheet = None
+            message = "No Data for %s" % str(self.reference)
+            return lambda: [message]
+
+        def load():
+            # The previous report was loaded before this runs, unless its
+            # load was superseded.
+            if (refine and previous is not None and
+                    timesheet.refines(previous)):
+                timesheet.narrow(previous)
             else:
-                display_time = utils.human_time(elapsed, 0)
-                if display_time != "00:00":
-                    yield self.fmt_ledger % (project, start_date, start_time,
-                                             stop, display_time)
+                timesheet.load()
+            return timesheet.view()
 
-        for line in self._footer():
-            yield line
+        self.timesheet = timesheet
+        return load
 
 
 class Week(Day):
     """Generate a report like `Day`, but for the week."""
 
-    def __init__(self, master):
-        Day.__init__(self, master)
+    use_rollups = True
+
+    def __init__(self, master, scheduler):
+        Day.__init__(self, master, scheduler)
         self.delta = relativedelta(weeks=1)
 
     def start(self):
@@ -292,8 +282,10 @@ class Week(Day):
 class Month(Day):
     """Generate a report like `Day` but for the month."""
 
-    def __init__(self, master):
-        Day.__init__(self, master)
+    use_rollups = True
+
+    def __init__(self, master, scheduler):
+        Day.__init__(self, master, scheduler)
         self.delta = relativedelta(months=1)
 
     def start(self):
@@ -306,14 +298,16 @@ class Month(Day):
 class CustomRange(Day):
     """Generate a report like `Day` but for a user entered date range."""
 
-    def __init__(self, master):
-        self.start_entry = tk.StringVar()
-        self.stop_entry = tk.StringVar()
+    use_rollups = True
 
-        Day.__init__(self, master)
+    def __init__(self, master, scheduler):
+        # The entries are set before their traces are added when creating
+        # the widgets, so that nothing is loaded until the first poll.
+        today = datetime.today().date().isoformat()
+        self.start_entry = tk.StringVar(value=today)
+        self.stop_entry = tk.StringVar(value=today)
 
-        self.start_entry.set(self.reference.isoformat())
-        self.stop_entry.set(self.reference.isoformat())
+        Day.__init__(self, master, scheduler)
 
         self.delta = relativedelta(months=1)
 
@@ -322,7 +316,7 @@ class CustomRange(Day):
 
         Hides the navigation buttons, and replaces them with 2 entry fields
         which should be specified in YYYY-MM-DD format.  The results will
-        update as soon as valid values are entered.
+        update once valid values are entered.
         """
         Day.create_widgets(self)
 
@@ -347,3 +341,13 @@ class CustomRange(Day):
     def stop(self):
         return utils.end_of_day(datetime.strptime(self.stop_entry.get(),
                                                   '%Y-%m-%d'))
+
+    def valid(self):
+        """Return true if both dates are complete, and in order."""
+        try:
+            return self.start() <= self.stop()
+        except ValueError:
+            return False
+
+
+instrument.methods(Report, ['update', 'poll', 'on_loaded'])
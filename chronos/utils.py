@@ -4,11 +4,18 @@
 
 from __future__ import absolute_import, division
 
-from datetime import datetime, timedelta
+import bisect
+from datetime import date, datetime, time, timedelta
 from dateutil.relativedelta import relativedelta, MO, SU
 from dateutil import tz
 
 
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# The ordinal of the first day of the unix epoch, see `date.toordinal()`.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
 def human_time(t, round_min=15):
     """Format a timestamp as a human readable string.
 
@@ -37,6 +44,13 @@ def human_time(t, round_min=15):
     return "%02d:%02d" % (h, m)
 
 
+def encode(value):
+    """Encode unicode values as UTF-8 for writing."""
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
 def timestamp(dt):
     """Return the epoch seconds since Jan 1, 1970 UTC.
 
@@ -111,3 +125,132 @@ def end_of_week(dt):
     """Return the last second of the Sunday of the given week."""
     sunday = dt + relativedelta(weekday=SU)
     return last_second(sunday)
+
+
+class LocalTimeConverter(object):
+    """Convert many epoch seconds (UTC) to local dates and times.
+
+    The UTC offsets of the local timezone, and the times at which they
+    change, are looked up once for a range of timestamps.  Converting a
+    timestamp within the range is then a matter of integer arithmetic,
+    which is much faster than going through `local_time()`, while still
+    taking daylight saving time into account.
+
+    The range only covers the timestamps converted so far, it is extended
+    as timestamps outside of it are converted.
+    """
+
+    # The interval at which the offset is sampled.  Timezones keep their
+    # offset for longer than this, so each change lies between two samples
+    # and is narrowed down to the second from there.
+    STEP = 7 * SECONDS_PER_DAY
+
+    # How far past a timestamp the range is extended to, so that records
+    # converted in order extend it once in a while rather than each time.
+    MARGIN = 366 * SECONDS_PER_DAY
+
+    def __init__(self, min_ts=None, max_ts=None, tzinfo=None):
+        """Find the offset transitions between the two timestamps, if given.
+
+        :param int min_ts: The first epoch seconds (UTC) to convert.
+        :param int max_ts: The last epoch seconds (UTC) to convert.
+        :param tzinfo: The timezone, defaults to the local timezone.
+        """
+        self.tzinfo = tzinfo or tz.tzlocal()
+        self.min_ts = None
+        self.max_ts = None
+        self.transitions = []
+        self.offsets = []
+
+        if min_ts is not None:
+            self._cover(min_ts, min_ts if max_ts is None else max_ts)
+
+        self._dates = {}
+
+    def _offset(self, ts):
+        """Look up the UTC offset in seconds at the given timestamp."""
+        offset = datetime.fromtimestamp(ts, self.tzinfo).utcoffset()
+        return int(offset.total_seconds())
+
+    def _scan(self, lo, hi):
+        """Find the offset transitions between two timestamps.
+
+        :return tuple: The transitions, starting with `lo`, and the offset
+                       from each of them on.
+        """
+        offset = self._offset(lo)
+        transitions = [lo]
+        offsets = [offset]
+
+        ts = lo
+        while ts < hi:
+            next_ts = min(ts + self.STEP, hi)
+            next_offset = self._offset(next_ts)
+            if next_offset != offset:
+                lo_ts, hi_ts = ts, next_ts
+                while hi_ts - lo_ts > 1:
+                    mid = (lo_ts + hi_ts) // 2
+                    if self._offset(mid) == offset:
+                        lo_ts = mid
+                    else:
+                        hi_ts = mid
+                transitions.append(hi_ts)
+                offsets.append(next_offset)
+                offset = next_offset
+            ts = next_ts
+
+        return transitions, offsets
+
+    def _cover(self, lo, hi):
+        """Extend the range to cover the timestamps from `lo` to `hi`."""
+        if self.min_ts is None:
+            self.transitions, self.offsets = self._scan(lo, hi)
+            self.min_ts, self.max_ts = lo, hi
+            return
+
+        if lo < self.min_ts:
+            # The scan ends with the offset at the old start of the range.
+            transitions, offsets = self._scan(lo, self.min_ts)
+            self.transitions = transitions + self.transitions[1:]
+            self.offsets = offsets + self.offsets[1:]
+            self.min_ts = lo
+
+        if hi > self.max_ts:
+            # The scan starts with the offset at the old end of the range.
+            transitions, offsets = self._scan(self.max_ts, hi)
+            self.transitions.extend(transitions[1:])
+            self.offsets.extend(offsets[1:])
+            self.max_ts = hi
+
+    def local_seconds(self, ts):
+        """Return the local wall clock time as seconds since the epoch."""
+        if self.min_ts is None:
+            self._cover(ts, ts + self.MARGIN)
+        elif ts < self.min_ts:
+            self._cover(ts - self.MARGIN, self.max_ts)
+        elif ts > self.max_ts:
+            self._cover(self.min_ts, ts + self.MARGIN)
+        idx = bisect.bisect_right(self.transitions, ts) - 1
+        return ts + self.offsets[idx]
+
+    def date(self, ts):
+        """Return the local date of the timestamp."""
+        ordinal = self.local_seconds(ts) // SECONDS_PER_DAY + EPOCH_ORDINAL
+        try:
+            return self._dates[ordinal]
+        except KeyError:
+            day = self._dates[ordinal] = date.fromordinal(ordinal)
+            return day
+
+    def time(self, ts):
+        """Return the local time of day of the timestamp."""
+        seconds = self.local_seconds(ts) % SECONDS_PER_DAY
+        return time(seconds // 3600, (seconds % 3600) // 60, seconds % 60)
+
+    def dates(self, timestamps):
+        """Return the local dates of a batch of timestamps."""
+        return [self.date(ts) for ts in timestamps]
+
+    def times(self, timestamps):
+        """Return the local times of day of a batch of timestamps."""
+        return [self.time(ts) for ts in timestamps]
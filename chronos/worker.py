@@ -0,0 +1,193 @@
+# Copyright (C) 2017, Anthony Oteri
+# All rights reserved.
+"""Background worker for database access.
+
+Requests are queued and run in order on a single worker thread, so that a
+slow query never blocks the Tk main loop, and the database connection is
+only ever used from the thread which opened it.  The results are handed
+back to the main thread, which polls for them with `after()` since Tk may
+only be called from the thread running its main loop.
+
+A request submitted with a key supersedes any earlier request with the
+same key which has not completed yet, e.g. the previous load of a report,
+and the superseded request is skipped or its result discarded.
+
+Until a worker has been started, requests are run as soon as they are
+submitted.
+"""
+
+from __future__ import absolute_import
+
+import logging
+import Queue
+import threading
+
+log = logging.getLogger(__name__)
+
+# The worker used by `submit()`, if started.
+_worker = None
+
+
+class Request(object):
+    """A function to be run by the worker, and what to do with its result."""
+
+    def __init__(self, fn, callback=None, errback=None, key=None):
+        """Describe the request.
+
+        :param callable fn: Run on the worker thread, must not touch Tk.
+        :param callable callback: Called on the main thread with the result.
+        :param callable errback: Called on the main thread with the
+                                 exception, if `fn` raised one.
+        :param key: Requests with the same key supersede each other.
+        """
+        self.fn = fn
+        self.callback = callback
+        self.errback = errback
+        self.key = key
+        self.cancelled = False
+
+    def cancel(self):
+        """Skip the request if it has not run yet, and ignore its result."""
+        self.cancelled = True
+
+    def run(self):
+        """Run the function, returning its result and exception."""
+        if self.cancelled:
+            return None, None
+
+        try:
+            return self.fn(), None
+        except Exception as e:
+            log.exception("Error running %r", self.fn)
+            return None, e
+
+    def complete(self, result, error):
+        """Call the callback or errback, unless cancelled."""
+        if self.cancelled:
+            return
+
+        if error is not None:
+            callback, value = self.errback, error
+        else:
+            callback, value = self.callback, result
+
+        if callback is not None:
+            try:
+                callback(value)
+            except Exception:
+                log.exception("Error completing %r", self.fn)
+
+
+class Worker(object):
+    """A thread running the requests, with results polled by Tk."""
+
+    POLLING_INTERVAL_MS = 20
+
+    def __init__(self, window):
+        """Initialize the worker for the given top level window."""
+        self.window = window
+        self.requests = Queue.Queue()
+        self.results = Queue.Queue()
+
+        # The latest request submitted with each key.
+        self.latest = {}
+
+        # The number of requests submitted which have not completed yet.
+        self.outstanding = 0
+        self._after_id = None
+
+        self.thread = threading.Thread(target=self._run, name='chronos-db')
+        self.thread.daemon = True
+
+    def start(self):
+        """Start the worker thread."""
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        """Finish the requests already submitted and stop the thread."""
+        self.requests.put(None)
+        self.thread.join(timeout)
+
+    def submit(self, request):
+        """Queue the request, superseding the latest one with its key."""
+        if request.key is not None:
+            previous = self.latest.get(request.key)
+            if previous is not None:
+                previous.cancel()
+            self.latest[request.key] = request
+
+        self.outstanding += 1
+        self.requests.put(request)
+        self._schedule()
+        return request
+
+    def _run(self):
+        """Run the requests in order, on the worker thread."""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            result, error = request.run()
+            self.results.put((request, result, error))
+
+    def _schedule(self):
+        if self._after_id is None:
+            self._after_id = self.window.after(self.POLLING_INTERVAL_MS,
+                                               self.poll)
+
+    def poll(self):
+        """Complete the requests which have run, on the main thread."""
+        self._after_id = None
+
+        while True:
+            try:
+                request, result, error = self.results.get_nowait()
+            except Queue.Empty:
+                break
+
+            self.outstanding -= 1
+            if self.latest.get(request.key) is request:
+                del self.latest[request.key]
+            request.complete(result, error)
+
+        if self.outstanding:
+            self._schedule()
+
+    @property
+    def busy(self):
+        """Return true while any request has not completed."""
+        return self.outstanding > 0
+
+
+def start(window):
+    """Start running the requests submitted from now on in the background.
+
+    :param window: The Tk top level window, used to poll for results.
+    """
+    global _worker
+    _worker = Worker(window)
+    _worker.start()
+
+
+def stop(timeout=None):
+    """Finish the requests already submitted and stop the worker."""
+    global _worker
+    if _worker is not None:
+        _worker.stop(timeout)
+        _worker = None
+
+
+def submit(fn, callback=None, errback=None, key=None):
+    """Run the function on the worker, and pass its result to the callback.
+
+    :param callable fn: Run on the worker thread, must not touch Tk.
+    :param callable callback: Called on the main thread with the result.
+    :param callable errback: Called on the main thread with the exception.
+    :param key: Cancel the pending request with the same key, if any.
+    :return Request:
+    """
+    request = Request(fn, callback, errback, key)
+    if _worker is None:
+        request.complete(*request.run())
+        return request
+    return _worker.submit(request)
@@ -25,6 +25,10 @@ install_requires = [
     'wheel==0.26.0',
 ]
 
+extras_require = {
+    'analytics': ['numpy'],
+}
+
 tests_require = [
     'pytest',
     'pytest-mock',
@@ -34,6 +38,8 @@ setup(
     name=__NAME__,
     version=__VERSION__,
     packages=find_packages(),
+    package_data={'chronos.migrations': ['script.py.mako',
+                                          'versions/*.py']},
     author=__AUTHOR__,
     author_email='anthony.oteri@gmail.com',
     description='time clock',
@@ -41,12 +47,17 @@ setup(
     url='http://github.com/anthonyoteri/chronos',
     setup_requires=setup_requires,
     install_requires=install_requires,
+    extras_require=extras_require,
     tests_require=tests_require,
     app=['script.py'],
+    entry_points={
+        'console_scripts': ['chronos = chronos.main:main'],
+    },
     options={
         "py2app": {
             "includes": ["sqlalchemy.dialects.sqlite",
                          "sqlalchemy.sql.default_comparator"],
+            "packages": ["chronos.migrations"],
             "argv_emulation": False,
             'plist': {
                 'CFBundleName': __NAME__,